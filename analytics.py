@@ -0,0 +1,282 @@
+import time
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import and_, bindparam, func, tuple_
+from models import ParkingHistory, OccupancyRollup, db
+
+# space_id used for lot-wide rollup rows
+LOT_SPACE_ID = -1
+
+GRANULARITIES = ('hour', 'day')
+
+
+def bucket_start(timestamp, granularity):
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_length(granularity):
+    return timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+
+
+def split_interval(start, end, granularity):
+    """Yield (bucket_start, seconds) for the part of [start, end) in each bucket"""
+    while start < end:
+        bucket = bucket_start(start, granularity)
+        bucket_end = min(bucket + bucket_length(granularity), end)
+        yield bucket, (bucket_end - start).total_seconds()
+        start = bucket_end
+
+
+def ensure_indexes(engine):
+    """Create history indexes on databases made before they were declared"""
+    for index in ParkingHistory.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+
+class RollupStore:
+    """Incrementally maintained hourly/daily occupancy rollups
+
+    Registered as an occupancy listener, it tracks when each space became
+    occupied. A background thread checkpoints every ``interval`` seconds:
+    occupied and observed time since the last checkpoint is split into
+    hour and day buckets, per space and for the whole lot
+    (``LOT_SPACE_ID``), and added to OccupancyRollup with a handful of
+    bulk statements. The same thread applies raw history retention, after
+    ``backfill`` has rolled up any history recorded before rollups were
+    kept, so deleting raw rows never loses their occupancy.
+    """
+
+    def __init__(self, interval=60, history_retention_days=30, hourly_retention_days=90,
+                 retention_batch_size=5000, retention_interval=3600):
+        self.interval = interval
+        self.history_retention_days = history_retention_days
+        self.hourly_retention_days = hourly_retention_days
+        self.retention_batch_size = retention_batch_size
+        self.retention_interval = retention_interval
+
+        self.started_at = datetime.utcnow()
+        self._last_checkpoint = self.started_at
+        self._occupied_since = {}
+        self._known = set()
+        self._totals = {}
+        self._backfilled = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def _add(self, space_id, start, end, column, totals=None):
+        totals = self._totals if totals is None else totals
+        for granularity in GRANULARITIES:
+            for bucket, seconds in split_interval(start, end, granularity):
+                for key_space in (space_id, LOT_SPACE_ID):
+                    totals.setdefault((granularity, key_space, bucket), [0.0, 0.0, 0])[column] += seconds
+
+    def _add_transition(self, space_id, timestamp, totals=None):
+        totals = self._totals if totals is None else totals
+        for granularity in GRANULARITIES:
+            for key_space in (space_id, LOT_SPACE_ID):
+                totals.setdefault((granularity, key_space, bucket_start(timestamp, granularity)),
+                                  [0.0, 0.0, 0])[2] += 1
+
+    def apply(self, transitions):
+        """Occupancy listener: open and close occupied intervals"""
+        with self._lock:
+            for space_id, occupied, timestamp in transitions:
+                # Rows loaded at startup are state, not transitions, and the
+                # time before this process started was not observed
+                counted = timestamp is not None and timestamp >= self.started_at
+                timestamp = max(timestamp or self.started_at, self._last_checkpoint)
+                self._known.add(space_id)
+                since = self._occupied_since.get(space_id)
+                if occupied and since is None:
+                    self._occupied_since[space_id] = timestamp
+                elif not occupied and since is not None:
+                    self._add(space_id, since, timestamp, 0)
+                    del self._occupied_since[space_id]
+                else:
+                    continue
+                if counted:
+                    self._add_transition(space_id, timestamp)
+
+    def checkpoint(self, now=None):
+        """Credit time up to now and return the accumulated bucket totals"""
+        now = now or datetime.utcnow()
+        with self._lock:
+            start, self._last_checkpoint = self._last_checkpoint, now
+            for space_id in self._known:
+                self._add(space_id, start, now, 1)
+            for space_id, since in self._occupied_since.items():
+                self._add(space_id, since, now, 0)
+                self._occupied_since[space_id] = now
+            totals, self._totals = self._totals, {}
+        return totals
+
+    def flush(self, app, now=None):
+        """Checkpoint and add the totals to OccupancyRollup; returns rows touched"""
+        totals = self.checkpoint(now)
+        if not totals:
+            return 0
+        try:
+            return self._write(app, totals)
+        except Exception:
+            # Fold the totals back in for the next flush
+            with self._lock:
+                for key, values in totals.items():
+                    pending = self._totals.setdefault(key, [0.0, 0.0, 0])
+                    for i, value in enumerate(values):
+                        pending[i] += value
+            raise
+
+    def backfill(self, app):
+        """Roll up history recorded before rollups were kept; returns rows read
+
+        Every history row written while a RollupStore listens is already
+        counted live, so only rows older than the earliest rollup bucket
+        (or this process, on an empty rollup table) are rolled up. Each
+        space is taken to hold a recorded state until its next recorded
+        change; time after its last change before that point is unknown
+        and not counted.
+        """
+        with app.app_context():
+            boundary = db.session.query(func.min(OccupancyRollup.bucket_start)).scalar() or self.started_at
+            rows = (db.session.query(ParkingHistory.space_id, ParkingHistory.occupied, ParkingHistory.timestamp)
+                    .filter(ParkingHistory.timestamp < boundary)
+                    .order_by(ParkingHistory.space_id, ParkingHistory.timestamp, ParkingHistory.id)
+                    .yield_per(10000))
+            totals = {}
+            previous = None
+            count = 0
+            for space_id, occupied, timestamp in rows:
+                count += 1
+                if previous is not None and previous[0] == space_id:
+                    self._add(space_id, previous[2], timestamp, 1, totals)
+                    if previous[1]:
+                        self._add(space_id, previous[2], timestamp, 0, totals)
+                    if bool(occupied) != bool(previous[1]):
+                        self._add_transition(space_id, timestamp, totals)
+                previous = (space_id, occupied, timestamp)
+        if totals:
+            self._write(app, totals)
+        self._backfilled = True
+        return count
+
+    def _write(self, app, totals):
+        """Add bucket totals to OccupancyRollup with bulk UPDATE/INSERT"""
+        table = OccupancyRollup.__table__
+        with app.app_context():
+            try:
+                keys = list(totals)
+                key_columns = tuple_(table.c.granularity, table.c.space_id, table.c.bucket_start)
+                existing = set(db.session.execute(
+                    db.select(table.c.granularity, table.c.space_id, table.c.bucket_start)
+                    .where(table.c.bucket_start.in_({bucket for _, _, bucket in keys}))
+                    .where(key_columns.in_(keys))
+                ).tuples())
+
+                updates = [{'g': key[0], 's': key[1], 'b': key[2], 'occupied': values[0],
+                            'observed': values[1], 'transitions': values[2]}
+                           for key, values in totals.items() if key in existing]
+                if updates:
+                    db.session.execute(
+                        table.update()
+                        .where(and_(table.c.granularity == bindparam('g'),
+                                    table.c.space_id == bindparam('s'),
+                                    table.c.bucket_start == bindparam('b')))
+                        .values(occupied_seconds=table.c.occupied_seconds + bindparam('occupied'),
+                                observed_seconds=table.c.observed_seconds + bindparam('observed'),
+                                transitions=table.c.transitions + bindparam('transitions')),
+                        updates)
+
+                inserts = [{'granularity': key[0], 'space_id': key[1], 'bucket_start': key[2],
+                            'occupied_seconds': values[0], 'observed_seconds': values[1],
+                            'transitions': values[2]}
+                           for key, values in totals.items() if key not in existing]
+                if inserts:
+                    db.session.execute(table.insert(), inserts)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        return len(totals)
+
+    def apply_retention(self, app, now=None):
+        """Delete raw history and hourly rollups past retention, in batches"""
+        if not self._backfilled:
+            # Raw rows are only deleted once their occupancy is rolled up
+            self.backfill(app)
+        now = now or datetime.utcnow()
+        deleted = 0
+        with app.app_context():
+            if self.history_retention_days:
+                cutoff = now - timedelta(days=self.history_retention_days)
+                while True:
+                    ids = db.select(ParkingHistory.id).where(ParkingHistory.timestamp < cutoff) \
+                        .limit(self.retention_batch_size).scalar_subquery()
+                    result = db.session.execute(db.delete(ParkingHistory).where(ParkingHistory.id.in_(ids)))
+                    db.session.commit()
+                    deleted += result.rowcount
+                    if result.rowcount < self.retention_batch_size:
+                        break
+            if self.hourly_retention_days:
+                cutoff = now - timedelta(days=self.hourly_retention_days)
+                result = db.session.execute(db.delete(OccupancyRollup)
+                                            .where(OccupancyRollup.granularity == 'hour')
+                                            .where(OccupancyRollup.bucket_start < cutoff))
+                db.session.commit()
+                deleted += result.rowcount
+        return deleted
+
+    def _run(self, app):
+        last_retention = None
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush(app)
+                if last_retention is None or time.monotonic() - last_retention >= self.retention_interval:
+                    last_retention = time.monotonic()
+                    self.apply_retention(app)
+            except Exception as e:
+                print(f"Error in occupancy rollup: {e}")
+
+    def start(self, app):
+        try:
+            read = self.backfill(app)
+            if read:
+                print(f"Rolled up {read} history rows recorded before occupancy rollups")
+        except Exception as e:
+            print(f"Error in occupancy rollup backfill: {e}")
+        self._thread = threading.Thread(target=self._run, args=(app,), name='occupancy-rollup', daemon=True)
+        self._thread.start()
+
+    def stop(self, app=None):
+        self._stop_event.set()
+        if app is not None:
+            self.flush(app)
+
+
+def utilization(granularity, start, end, space_id=LOT_SPACE_ID):
+    """Rollup buckets in [start, end) for one space or the lot, oldest first"""
+    rows = (OccupancyRollup.query
+            .filter_by(granularity=granularity, space_id=space_id)
+            .filter(OccupancyRollup.bucket_start >= bucket_start(start, granularity))
+            .filter(OccupancyRollup.bucket_start < end)
+            .order_by(OccupancyRollup.bucket_start)
+            .all())
+    buckets = [{
+        'bucket_start': row.bucket_start.isoformat(),
+        'occupied_minutes': row.occupied_seconds / 60.0,
+        'observed_minutes': row.observed_seconds / 60.0,
+        'utilization': row.occupied_seconds / row.observed_seconds if row.observed_seconds else None,
+        'transitions': row.transitions,
+    } for row in rows]
+    occupied = sum(row.occupied_seconds for row in rows)
+    observed = sum(row.observed_seconds for row in rows)
+    return {
+        'granularity': granularity,
+        'space_id': space_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'utilization': occupied / observed if observed else None,
+        'buckets': buckets,
+    }
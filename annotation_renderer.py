@@ -0,0 +1,164 @@
+import cv2
+import threading
+import numpy as np
+from datetime import datetime
+
+OCCUPIED_COLOR = (0, 0, 255)
+AVAILABLE_COLOR = (0, 255, 0)
+LABEL_COLOR = (255, 255, 255)
+FILL_ALPHA = 0.3
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class _Sprite:
+    """Pixels drawn by a few OpenCV calls, as flat frame indices and colors"""
+
+    def __init__(self, frame_shape, draw_calls):
+        frame_h, frame_w = frame_shape
+        # Bounds of everything drawn, padded for line thickness
+        x0, y0, x1, y1 = frame_w, frame_h, 0, 0
+        for bounds, _ in draw_calls:
+            x0, y0 = min(x0, bounds[0]), min(y0, bounds[1])
+            x1, y1 = max(x1, bounds[2]), max(y1, bounds[3])
+        x0, y0 = max(x0 - 2, 0), max(y0 - 2, 0)
+        x1, y1 = min(x1 + 2, frame_w), min(y1 + 2, frame_h)
+
+        if x1 <= x0 or y1 <= y0:
+            self.pixels = np.zeros(0, dtype=np.intp)
+            self.colors = np.zeros((0, 3), dtype=np.uint8)
+            return
+
+        # Draw in a local window; later calls overwrite earlier ones as usual
+        canvas = np.zeros((y1 - y0, x1 - x0, 3), dtype=np.uint8)
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        offset = np.array([x0, y0], np.int32)
+        for _, draw in draw_calls:
+            draw(canvas, mask, offset)
+
+        ys, xs = np.nonzero(mask)
+        self.pixels = ((ys + y0) * frame_w + (xs + x0)).astype(np.intp)
+        self.colors = canvas[ys, xs]
+
+
+def _polyline(polygon, color):
+    x, y, w, h = cv2.boundingRect(polygon)
+
+    def draw(canvas, mask, offset):
+        local = polygon - offset
+        cv2.polylines(canvas, [local], True, color, 2)
+        cv2.polylines(mask, [local], True, 255, 2)
+    return (x, y, x + w, y + h), draw
+
+
+def _text(text, origin, scale, color):
+    (w, h), baseline = cv2.getTextSize(text, FONT, scale, 2)
+    x, y = origin
+
+    def draw(canvas, mask, offset):
+        local = (x - int(offset[0]), y - int(offset[1]))
+        cv2.putText(canvas, text, local, FONT, scale, color, 2)
+        cv2.putText(mask, text, local, FONT, scale, 255, 2)
+    return (x, y - h, x + w, y + baseline), draw
+
+
+class AnnotationRenderer:
+    """Draws occupancy overlays without per-space full-frame copies
+
+    Everything that only depends on the layout is rasterized once: the
+    fill pixels of every space, the space id labels, and each space's
+    outline and status text in both states. Two frame-sized layers are
+    kept up to date: a tint layer with every space filled in its state's
+    colour, and an overlay layer with the outlines and text. Per frame
+    the tint is blended in one pass under the lot mask and the overlay
+    copied on top. When a space changes state only its fill is repainted
+    and the overlay is re-scattered from the cached sprites.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.frame_shape = layout.frame_shape
+        self.state = None
+
+        # Fill pixels, one per covered pixel (the first space wins overlaps)
+        # and grouped by space so a space's fill is one contiguous segment
+        flat_labels = layout.labels.ravel()
+        covered = np.flatnonzero(flat_labels)
+        order = np.argsort(flat_labels[covered], kind='stable')
+        self.fill_pixels = covered[order]
+        counts = np.bincount(flat_labels[self.fill_pixels], minlength=len(layout) + 1)[1:]
+        self.fill_starts = np.zeros(len(layout) + 1, dtype=np.intp)
+        self.fill_starts[1:] = np.cumsum(counts)
+        self.fill_mask = (layout.labels > 0).astype(np.uint8)
+
+        # Outline + status text for each space in each state
+        self.sprites = [
+            (self._space_sprite(roi, False), self._space_sprite(roi, True))
+            for roi in layout
+        ]
+
+        # Space ids never change colour, so they form one static layer
+        self.labels = _Sprite(self.frame_shape, [
+            _text(str(roi.space_id), (roi.center[0] - 10, roi.center[1]), 0.7, LABEL_COLOR)
+            for roi in layout
+        ])
+
+        frame_h, frame_w = self.frame_shape
+        self.tint = np.zeros((frame_h, frame_w, 3), dtype=np.uint8)
+        self.overlay = np.zeros((frame_h, frame_w, 3), dtype=np.uint8)
+        self.overlay_mask = np.zeros((frame_h, frame_w), dtype=np.uint8)
+        self._lock = threading.Lock()
+
+    def _space_sprite(self, roi, occupied):
+        color = OCCUPIED_COLOR if occupied else AVAILABLE_COLOR
+        status = "Occupied" if occupied else "Available"
+        return _Sprite(self.frame_shape, [
+            _polyline(roi.polygon, color),
+            _text(status, (roi.center[0] - 30, roi.center[1] + 25), 0.6, color),
+        ])
+
+    def update(self, results):
+        """Repaint the layers for spaces whose state changed"""
+        results = np.asarray(results, dtype=bool)
+        if self.state is None:
+            changed = np.arange(len(results))
+        else:
+            changed = np.flatnonzero(results != self.state)
+        if len(changed) == 0:
+            return changed
+
+        tint = self.tint.reshape(-1, 3)
+        for i in changed:
+            start, end = self.fill_starts[i], self.fill_starts[i + 1]
+            tint[self.fill_pixels[start:end]] = OCCUPIED_COLOR if results[i] else AVAILABLE_COLOR
+        self.state = results.copy()
+
+        # Text of one space can overlap a neighbour's outline, so the overlay
+        # is rebuilt from the cached sprites in layout order, labels last
+        sprites = [self.sprites[i][int(occupied)] for i, occupied in enumerate(self.state)]
+        sprites.append(self.labels)
+        overlay = self.overlay.reshape(-1, 3)
+        overlay_mask = self.overlay_mask.reshape(-1)
+        overlay_mask[:] = 0
+        for sprite in sprites:
+            overlay[sprite.pixels] = sprite.colors
+            overlay_mask[sprite.pixels] = 1
+        return changed
+
+    def render(self, frame, results):
+        """Annotate frame in place and return it"""
+        with self._lock:
+            self.update(results)
+            blended = cv2.addWeighted(frame, 1 - FILL_ALPHA, self.tint, FILL_ALPHA, 0)
+            frame = cv2.copyTo(blended, self.fill_mask, frame)
+            frame = cv2.copyTo(self.overlay, self.overlay_mask, frame)
+            occupied_count = int(self.state.sum())
+            total_count = len(self.state)
+
+        # Timestamp and statistics change every frame
+        utilization = (occupied_count / total_count * 100) if total_count > 0 else 0
+
+        cv2.putText(frame, datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                   (10, 30), FONT, 0.7, (255, 255, 255), 2)
+        cv2.putText(frame, f"Occupied: {occupied_count}/{total_count} ({utilization:.1f}%)",
+                   (10, 60), FONT, 0.7, (255, 255, 255), 2)
+        return frame
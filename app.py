@@ -4,17 +4,76 @@ from config import Config
 from database import db
 from models import User, ParkingSpace, ParkingHistory
 from yolo_parking_detector import YOLOParkingDetector
-from auth import auth
-import cv2
+from auth import auth, user_cache
+from camera_pool import CameraWorkerPool, CameraResultSink, load_camera_configs
+from detection_pipeline import DetectionPipeline
+from occupancy_snapshot import SnapshotStore
+from event_stream import EventBroker
+from mjpeg_broadcaster import FrameBroadcaster
+from frame_jobs import FrameJobQueue
+from metrics import registry as metrics_registry, profiler
+from analytics import RollupStore, ensure_indexes, utilization, GRANULARITIES, LOT_SPACE_ID
+from datetime import datetime, timedelta
+from recommendation_engine import RecommendationEngine, DEFAULT_RECOMMENDATIONS
+from parking_layout import load_bounding_boxes
+import os
+import json
 import threading
 import time
 
 # Initialize parking detector (will be initialized in main)
 parking_detector = None
-latest_frame = None
-frame_lock = threading.Lock()
+detection_pipeline = None
+camera_pool = None
+
+# Encodes each annotated frame once and fans it out to /video_feed viewers
+frame_broadcaster = FrameBroadcaster()
+
+# On-demand frames for /api/process_frame, completed by the pipeline
+frame_jobs = FrameJobQueue()
+
+# Current occupancy, published by the detector and read by the API routes
+snapshot_store = SnapshotStore()
+event_broker = EventBroker(snapshot_store)
+
+# Nearest free spaces per entrance/zone, built from the layout in create_app
+recommendation_engine = None
+
+# Hourly/daily occupancy rollups behind /api/analytics/utilization
+rollup_store = RollupStore()
+
+def snapshot_response(body_name):
+    """Serve a pre-encoded snapshot body with ETag / If-None-Match support"""
+    snapshot = snapshot_store.current()
+    if request.if_none_match.contains(snapshot.etag):
+        response = Response(status=304)
+    else:
+        response = Response(getattr(snapshot, body_name), mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def default_recommendations_json():
+    """Body of a plain /api/parking_recommendations request, sent with events"""
+    if recommendation_engine is None:
+        return snapshot_store.current().recommendations_json
+    return json.dumps(recommendation_engine.recommend(), separators=(',', ':')).encode('utf-8')
+
+def create_recommendation_engine(app):
+    """Spatial recommendation engine for the configured layout, if it exists"""
+    if app.config['CAMERAS_CONFIG']:
+        # Each camera's layout is in its own frame coordinates, so distances
+        # can't be compared across cameras; serve the snapshot's instead
+        return None
+    path = app.config['BOUNDING_BOXES_PATH']
+    if not path or not os.path.exists(path):
+        return None
+    engine = RecommendationEngine(load_bounding_boxes(path), app.config['PARKING_ENTRANCES'], app.config['PARKING_ZONES'])
+    engine.apply(snapshot_store.current().spaces)
+    return engine
 
 def create_app():
+    global recommendation_engine
     app = Flask(__name__)
     app.config.from_object(Config)
     
@@ -26,9 +85,12 @@ def create_app():
     login_manager.login_view = 'auth.login'
     login_manager.init_app(app)
     
+    # Cached, so @login_required reads don't query the database
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return user_cache.load(user_id)
     
     # Register blueprints
     app.register_blueprint(auth)
@@ -36,6 +98,30 @@ def create_app():
     # Create tables
     with app.app_context():
         db.create_all()
+        ensure_indexes(db.engine)
+    
+    # Seed the occupancy snapshot and keep it updated from detector transitions
+    snapshot_store.load(app)
+    frame_broadcaster.default_preset = app.config['VIDEO_FEED_PRESET']
+    frame_jobs.max_jobs = app.config['FRAME_JOBS_MAX']
+    frame_jobs.ttl = app.config['FRAME_JOBS_TTL']
+    event_broker.resync_interval = app.config['EVENTS_RESYNC_INTERVAL']
+    event_broker.keepalive_interval = app.config['EVENTS_KEEPALIVE_INTERVAL']
+    event_broker.recommendations = default_recommendations_json
+    recommendation_engine = create_recommendation_engine(app)
+    # Order matters: events are published after the snapshot they describe,
+    # and recommendations never lag the snapshot ETag they are served under
+    listeners = [snapshot_store.apply, event_broker.publish, rollup_store.apply]
+    if recommendation_engine is not None:
+        listeners.insert(0, recommendation_engine.apply)
+    app.extensions['occupancy_listeners'] = listeners
+    rollup_store.interval = app.config['ROLLUP_INTERVAL']
+    rollup_store.history_retention_days = app.config['HISTORY_RETENTION_DAYS']
+    rollup_store.hourly_retention_days = app.config['HOURLY_ROLLUP_RETENTION_DAYS']
+    
+    metrics_registry.enabled = app.config['METRICS_ENABLED']
+    profiler.interval = app.config['PROFILER_INTERVAL']
+    metrics_registry.add_collector(collect_runtime_metrics)
     
     # Main routes
     @app.route('/')
@@ -49,7 +135,7 @@ def create_app():
             return redirect(url_for('admin_dashboard'))
         
         # Get parking status for user view
-        parking_spaces = ParkingSpace.query.all()
+        parking_spaces = snapshot_store.current().spaces
         return render_template('dashboard.html', parking_spaces=parking_spaces)
     
     @app.route('/admin')
@@ -71,128 +157,281 @@ def create_app():
     @app.route('/parking_status')
     @login_required
     def parking_status():
-        parking_spaces = ParkingSpace.query.all()
+        parking_spaces = snapshot_store.current().spaces
         return render_template('parking_status.html', parking_spaces=parking_spaces)
     
     @app.route('/video_feed')
     @login_required
     def video_feed():
-        def generate():
-            global latest_frame
-            while True:
-                with frame_lock:
-                    if latest_frame is not None:
-                        # Encode frame as JPEG
-                        ret, jpeg = cv2.imencode('.jpg', latest_frame)
-                        if ret:
-                            frame_data = jpeg.tobytes()
-                            
-                            # Yield frame in multipart format
-                            yield (b'--frame\r\n'
-                                   b'Content-Type: image/jpeg\r\n\r\n' + frame_data + b'\r\n\r\n')
-                time.sleep(0.033)  # ~30 FPS
-        
-        return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+        # ?quality=high|medium|low selects a resolution/quality preset
+        preset = request.args.get('quality', app.config['VIDEO_FEED_PRESET'])
+        return Response(frame_broadcaster.stream(preset),
+                        mimetype='multipart/x-mixed-replace; boundary=frame')
     
     @app.route('/api/parking_status')
     def api_parking_status():
-        parking_spaces = ParkingSpace.query.all()
-        return jsonify([{
-            'id': space.space_id,
-            'occupied': space.is_occupied,
-            'last_updated': space.last_updated.isoformat() if space.last_updated else None
-        } for space in parking_spaces])
+        return snapshot_response('status_json')
+    
+    @app.route('/api/parking_events')
+    @login_required
+    def api_parking_events():
+        """Server-Sent Events stream of occupancy changes"""
+        response = Response(event_broker.stream(), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
     
-    @app.route('/api/process_frame')
+    @app.route('/api/process_frame', methods=['POST'])
     @login_required
     def api_process_frame():
+        """Queue a job for the next processed frame; poll the returned URL"""
         if not current_user.is_admin:
             return jsonify({'error': 'Unauthorized'}), 403
         
-        if parking_detector:
-            frame, results = parking_detector.process_frame()
-            if frame is not None:
-                # Save processed frame
-                cv2.imwrite('static/latest_frame.jpg', frame)
-                return jsonify({'success': True, 'message': 'Frame processed'})
+        # Jobs are served by the running pipeline, never in the request thread
+        if detection_pipeline is None:
+            return jsonify({'success': False, 'message': 'Detection pipeline is not running'}), 503
         
-        return jsonify({'success': False, 'message': 'No frame processed'})
+        job = frame_jobs.submit()
+        return jsonify({
+            'success': True,
+            'message': 'Frame queued',
+            'job_id': job.id,
+            'status_url': url_for('api_frame_job', job_id=job.id),
+        }), 202
     
-    @app.route('/api/parking_recommendations')
+    @app.route('/api/process_frame/<job_id>')
     @login_required
-    def api_parking_recommendations():
-        """Get best parking spot recommendations"""
-        parking_spaces = ParkingSpace.query.all()
-        available_spaces = [space for space in parking_spaces if not space.is_occupied]
+    def api_frame_job(job_id):
+        if not current_user.is_admin:
+            return jsonify({'error': 'Unauthorized'}), 403
         
-        if not available_spaces:
-            return jsonify({
-                'available': False,
-                'message': 'No parking spaces available'
-            })
+        job = frame_jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Unknown or expired job'}), 404
+        data = job.to_dict()
+        if job.status == 'done':
+            data['frame_url'] = url_for('api_frame_job_image', job_id=job.id)
+        return jsonify(data)
+    
+    @app.route('/api/process_frame/<job_id>/frame.jpg')
+    @login_required
+    def api_frame_job_image(job_id):
+        if not current_user.is_admin:
+            return jsonify({'error': 'Unauthorized'}), 403
         
-        # Simple recommendation: first 3 available spaces
-        best_spots = [space.space_id for space in available_spaces[:3]]
+        job = frame_jobs.get(job_id)
+        if job is None or job.jpeg is None:
+            return jsonify({'error': 'Frame not available'}), 404
+        # Served from memory; nothing is written to disk
+        return Response(job.jpeg, mimetype='image/jpeg')
+    
+    @app.route('/api/pipeline_stats')
+    @login_required
+    def api_pipeline_stats():
+        if not current_user.is_admin:
+            return jsonify({'error': 'Unauthorized'}), 403
         
-        return jsonify({
-            'available': True,
-            'total_available': len(available_spaces),
-            'best_spots': best_spots,
-            'message': f'Recommended spots: {", ".join(map(str, best_spots))}'
-        })
+        if detection_pipeline is None:
+            return jsonify({'running': False})
+        return jsonify({'running': True, **detection_pipeline.stats()})
+    
+    @app.route('/api/analytics/utilization')
+    @login_required
+    def api_utilization():
+        """Occupancy per hour/day bucket for the lot or one space (?space_id=)"""
+        granularity = request.args.get('granularity', 'hour')
+        if granularity not in GRANULARITIES:
+            return jsonify({'error': 'granularity must be hour or day'}), 400
+        try:
+            end = datetime.fromisoformat(request.args['end']) if 'end' in request.args else datetime.utcnow()
+            start = (datetime.fromisoformat(request.args['start']) if 'start' in request.args
+                     else end - timedelta(days=1))
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO 8601 timestamps'}), 400
+        space_id = request.args.get('space_id', LOT_SPACE_ID, type=int)
+        return jsonify(utilization(granularity, start, end, space_id))
+    
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape endpoint"""
+        if not metrics_registry.enabled:
+            return Response('metrics disabled\n', status=404, mimetype='text/plain')
+        return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+    
+    @app.route('/api/profiler', methods=['GET', 'POST'])
+    @login_required
+    def api_profiler():
+        """Start/stop the sampling profiler (POST action=start|stop) or fetch its stacks"""
+        if not current_user.is_admin:
+            return jsonify({'error': 'Unauthorized'}), 403
+        
+        if request.method == 'POST':
+            action = request.form.get('action') or (request.get_json(silent=True) or {}).get('action')
+            if action == 'start':
+                profiler.start()
+            elif action == 'stop':
+                profiler.stop()
+            else:
+                return jsonify({'error': 'action must be start or stop'}), 400
+            return jsonify({'running': profiler.running, 'samples': profiler.samples})
+        
+        # Collapsed stacks, ready for flamegraph.pl / speedscope
+        return Response(profiler.report(request.args.get('limit', type=int)), mimetype='text/plain')
+    
+    @app.route('/api/parking_recommendations')
+    @login_required
+    def api_parking_recommendations():
+        """Nearest free spots (?k=, ?entrance=, ?zone=)"""
+        if recommendation_engine is None:
+            return snapshot_response('recommendations_json')
+        
+        k = min(max(request.args.get('k', DEFAULT_RECOMMENDATIONS, type=int), 1), 50)
+        entrance = request.args.get('entrance')
+        zone = request.args.get('zone')
+        etag = f'{snapshot_store.current().etag}-{k}-{entrance}-{zone}'
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            try:
+                response = jsonify(recommendation_engine.recommend(k, entrance, zone))
+            except KeyError as e:
+                return jsonify({'error': e.args[0]}), 404
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
 
     @app.route('/api/available_spaces')
     @login_required
     def api_available_spaces():
         """Get all available spaces"""
-        parking_spaces = ParkingSpace.query.all()
-        available_spaces = [space for space in parking_spaces if not space.is_occupied]
-        
-        return jsonify({
-            'available_spaces': [{
-                'space_id': space.space_id,
-                'last_updated': space.last_updated.isoformat() if space.last_updated else None
-            } for space in available_spaces]
-        })
+        return snapshot_response('available_json')
     
     return app
 
-def video_processing_thread():
-    """Thread for continuous video processing"""
-    global latest_frame, parking_detector
+def collect_runtime_metrics():
+    """Scrape-time gauges and counters for /metrics"""
+    if detection_pipeline is not None:
+        stats = detection_pipeline.stats()
+        queues = stats['queues'].items()
+        yield ('queue_depth', 'gauge', 'Items waiting in each pipeline queue',
+               [({'queue': name}, q['depth']) for name, q in queues])
+        yield ('frames_dropped_total', 'counter', 'Frames discarded because a stage fell behind',
+               [({'queue': name}, q['dropped']) for name, q in queues])
+        yield ('stage_processed_total', 'counter', 'Items processed by each pipeline stage',
+               [({'stage': name}, stage['processed']) for name, stage in stats['stages'].items()])
+        yield ('stage_errors_total', 'counter', 'Exceptions raised in each pipeline stage',
+               [({'stage': name}, stage['errors']) for name, stage in stats['stages'].items()])
+        yield ('annotations_skipped_total', 'counter', 'Frames not drawn because nobody watched',
+               [({}, stats['annotations_skipped'])])
+        yield ('camera_fps', 'gauge', 'Frames per second captured per camera',
+               [({'camera': 'default'}, detection_pipeline.fps())])
+    if camera_pool is not None:
+        yield ('camera_fps', 'gauge', 'Frames per second captured per camera',
+               [({'camera': camera_id}, fps) for camera_id, fps in camera_pool.fps().items()])
+    yield ('video_viewers', 'gauge', 'Connected /video_feed clients',
+           [({}, frame_broadcaster.viewer_count())])
+    yield ('event_subscribers', 'gauge', 'Connected /api/parking_events clients',
+           [({}, event_broker.subscribers)])
+
+
+def publish_frame(frame, packet):
+    """Pipeline callback handing the annotated frame to the video feed"""
+    frame_broadcaster.publish(frame)
+
+
+def detector_options(app):
+    """ParkingDetector.configure arguments for the configured optional stages"""
+    options = {}
+    if app.config['MOTION_GATE_ENABLED']:
+        options['motion_gate'] = dict(
+            scale=app.config['MOTION_GATE_SCALE'],
+            min_fps=app.config['MOTION_GATE_MIN_FPS'],
+            max_fps=app.config['MOTION_GATE_MAX_FPS'],
+        )
+    if app.config['BACKGROUND_MODEL_ENABLED']:
+        options['background_model'] = dict(
+            bootstrap_frames=app.config['BACKGROUND_BOOTSTRAP_FRAMES'],
+            alpha=app.config['BACKGROUND_ALPHA'],
+            update_interval=app.config['BACKGROUND_UPDATE_INTERVAL'],
+        )
+    if app.config['OCCUPANCY_FILTER_MODE']:
+        options['occupancy_filter'] = dict(
+            mode=app.config['OCCUPANCY_FILTER_MODE'],
+            window=app.config['OCCUPANCY_FILTER_WINDOW'],
+            required=app.config['OCCUPANCY_FILTER_REQUIRED'],
+            alpha=app.config['OCCUPANCY_FILTER_ALPHA'],
+        )
+    return options
+
+
+def start_detection_pipeline(app):
+    """Run capture, detection, annotation and persistence as pipeline stages"""
+    global detection_pipeline
+    parking_detector.configure(**detector_options(app))
+    detection_pipeline = DetectionPipeline(
+        parking_detector,
+        max_fps=app.config['PIPELINE_MAX_FPS'],
+        queue_size=app.config['PIPELINE_QUEUE_SIZE'],
+        drop_oldest=app.config['PIPELINE_DROP_OLDEST'],
+        on_frame=publish_frame,
+        should_annotate=frame_broadcaster.has_viewers,
+        jobs=frame_jobs,
+    )
+    detection_pipeline.start()
+
+def camera_results_thread(app):
+    """Thread applying multi-camera worker results to the database"""
+    sink = CameraResultSink(app, app.config['DB_FLUSH_INTERVAL'])
     while True:
         try:
-            if parking_detector:
-                frame, results = parking_detector.process_frame()
-                if frame is not None:
-                    with frame_lock:
-                        latest_frame = frame
-            time.sleep(0.033)  # ~30 FPS
+            result = camera_pool.get(timeout=1)
+            if result is not None:
+                sink.apply(result)
         except Exception as e:
-            print(f"Error in video processing thread: {e}")
+            print(f"Error in camera results thread: {e}")
             time.sleep(1)
 
 
+def start_camera_pool(app, cameras_path):
+    """Start one detection process per configured camera"""
+    global camera_pool
+    camera_pool = CameraWorkerPool(load_camera_configs(cameras_path),
+                                   queue_size=app.config['CAMERA_QUEUE_SIZE'],
+                                   detector_options=detector_options(app))
+    camera_pool.start()
+    results_thread = threading.Thread(target=camera_results_thread, args=(app,), daemon=True)
+    results_thread.start()
+    print(f"Camera worker pool started with {len(camera_pool.cameras)} cameras")
+
+
 if __name__ == '__main__':
     app = create_app()
     
-    # Initialize parking detector with app context
-    try:
+    if app.config['CAMERAS_CONFIG']:
+        # One detection process per camera instead of the single detector
+        start_camera_pool(app, app.config['CAMERAS_CONFIG'])
+    else:
+        # Initialize parking detector with app context
+        try:
             parking_detector = YOLOParkingDetector(
                 video_path="carPark.mp4",
-                json_path="bounding_boxes.json",
+                json_path=app.config['BOUNDING_BOXES_PATH'],
                 model_path="yolov11n_- visdrone.pt",  # Path to your YOLO model
                 app=app  # Pass the app for context
             )
             print("YOLO Parking detector initialized successfully")
             
-            # Start video processing thread
-            video_thread = threading.Thread(target=video_processing_thread, daemon=True)
-            video_thread.start()
-            print("Video processing thread started")
+            # Start the capture/detect/annotate/persist pipeline
+            start_detection_pipeline(app)
+            print("Detection pipeline started")
             
-    except Exception as e:
+        except Exception as e:
             print(f"Error initializing YOLO parking detector: {e}")
             parking_detector = None
-        
-    app.run(debug=True, threaded=True)
\ No newline at end of file
+    
+    rollup_store.start(app)
+    
+    # The reloader re-runs this block in a child process, which would start
+    # a second pipeline or set of camera processes and double the rollups
+    app.run(debug=True, threaded=True, use_reloader=False)
\ No newline at end of file
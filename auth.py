@@ -1,11 +1,60 @@
+import time
+import threading
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask_login import login_user, login_required, logout_user, current_user
+from flask_login import UserMixin, login_user, login_required, logout_user, current_user
 from database import db
 from models import User
 
 auth = Blueprint('auth', __name__)
 
+class SessionUser(UserMixin):
+    """Detached copy of the User fields that requests and templates read"""
+    
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.is_admin = bool(user.is_admin)
+
+class UserCache:
+    """Flask-Login user loader that keeps users for ttl seconds
+    
+    Every @login_required request loads its user; caching it keeps
+    authenticated read traffic off the database. Changes to a user
+    (e.g. admin rights) take effect within ttl seconds.
+    """
+    
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._users = {}
+        self._lock = threading.Lock()
+    
+    def load(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._users.get(user_id)
+        if cached is not None and now - cached[1] < self.ttl:
+            return cached[0]
+        
+        user = db.session.get(User, int(user_id))
+        if user is None:
+            self.invalidate(user_id)
+            return None
+        session_user = SessionUser(user)
+        with self._lock:
+            self._users[user_id] = (session_user, now)
+        return session_user
+    
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+user_cache = UserCache()
+
 @auth.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -0,0 +1,57 @@
+import time
+import cv2
+import numpy as np
+
+
+def median_background(frames):
+    """Per-pixel median of a few grayscale frames (parked cars that move drop out)"""
+    return np.median(np.stack(frames), axis=0).astype(np.uint8)
+
+
+class BackgroundModel:
+    """Running-average "empty lot" image that follows lighting changes
+
+    The model is a float32 running average updated with
+    ``cv2.accumulateWeighted`` only on pixels outside occupied spaces, and
+    at most once every ``update_interval`` seconds, so a parked car never
+    bleeds into the background. ``background`` is the uint8 image the
+    change mask is computed against; each update publishes a new array, so
+    readers on other threads never see a half-written frame.
+    """
+
+    def __init__(self, layout, initial, alpha=0.05, update_interval=2.0):
+        self.alpha = alpha
+        self.update_interval = update_interval
+        self.labels = layout.labels
+        self.num_spaces = len(layout)
+
+        self.average = initial.astype(np.float32)
+        self.background = initial.astype(np.uint8)
+        self.last_update = None
+        self.updates = 0
+
+    def free_mask(self, occupied):
+        """uint8 mask of pixels not covered by an occupied space"""
+        lut = np.zeros(self.num_spaces + 1, dtype=np.uint8)
+        lut[1:] = np.where(np.asarray(occupied, dtype=bool), 0, 255)
+        lut[0] = 255
+        return np.take(lut, self.labels)
+
+    def update(self, gray, occupied, now=None):
+        """Fold a frame into the model if due; returns the new background or None"""
+        now = time.monotonic() if now is None else now
+        if self.last_update is not None and now - self.last_update < self.update_interval:
+            return None
+        self.last_update = now
+
+        cv2.accumulateWeighted(gray, self.average, self.alpha, mask=self.free_mask(occupied))
+        self.background = cv2.convertScaleAbs(self.average)
+        self.updates += 1
+        return self.background
+
+    def stats(self):
+        return {
+            'updates': self.updates,
+            'alpha': self.alpha,
+            'update_interval': self.update_interval,
+        }
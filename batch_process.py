@@ -0,0 +1,197 @@
+"""Process recorded footage offline into per-frame occupancy timelines
+
+Each video is split into frame ranges that are scored in parallel by a
+pool of worker processes. The (optionally filtered) occupancy of every
+frame is saved as a bit-packed ``<name>.occupancy.npy`` array of shape
+(frames, ceil(spaces / 8)) next to a ``<name>.occupancy.json`` sidecar.
+
+    python batch_process.py carPark.mp4
+    python batch_process.py footage/ --workers 8 --output-dir timelines
+    python batch_process.py carPark.mp4 --annotate --filter nofm
+"""
+import os
+import json
+import time
+import argparse
+import multiprocessing
+import cv2
+import numpy as np
+from replay import apply_filter
+from parking_layout import load_bounding_boxes
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+# Frames per task; large enough to amortize the seek, small enough to balance
+DEFAULT_CHUNK_FRAMES = 500
+
+# Each worker process keeps the detector for the video it is on; videos
+# are processed one after another, so older ones are released
+_detector_key = None
+_cached_detector = None
+
+
+def find_videos(paths):
+    """Expand files and directories into a sorted list of video files"""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            videos.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                          if name.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            videos.append(path)
+    return videos
+
+
+def frame_ranges(frame_count, chunk_frames):
+    return [(start, min(start + chunk_frames, frame_count))
+            for start in range(0, frame_count, chunk_frames)]
+
+
+def _detector(video_path, json_path):
+    from parking_detection import ParkingDetector
+
+    global _detector_key, _cached_detector
+    key = (video_path, json_path)
+    if key != _detector_key:
+        if _cached_detector is not None:
+            _cached_detector.release()
+        # Drop the old detector before building the next one
+        _detector_key = _cached_detector = None
+        _cached_detector = ParkingDetector(video_path, json_path)
+        _detector_key = key
+    return _cached_detector
+
+
+def init_worker():
+    # The pool already runs one process per core
+    cv2.setNumThreads(1)
+
+
+def score_range(task):
+    """Worker: raw votes (0-3) for frames [start, end) of one video"""
+    video_path, json_path, start, end = task
+    detector = _detector(video_path, json_path)
+    detector.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    votes = np.zeros((end - start, len(detector.layout)), dtype=np.uint8)
+    count = 0
+    while count < end - start:
+        ret, frame = detector.cap.read()
+        if not ret:
+            break
+        votes[count] = detector.scorer.score(detector.compute_features(frame))
+        count += 1
+    return start, votes[:count]
+
+
+def write_annotated(video_path, json_path, states, output_path):
+    """Re-read the video and draw the final timeline onto it"""
+    from parking_detection import ParkingDetector
+
+    detector = ParkingDetector(video_path, json_path)
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    writer = cv2.VideoWriter(output_path, fourcc, detector.fps or 25, (detector.width, detector.height))
+    try:
+        for occupied in states:
+            ret, frame = detector.cap.read()
+            if not ret:
+                break
+            writer.write(detector.draw_bounding_boxes(frame, occupied))
+    finally:
+        writer.release()
+        detector.release()
+
+
+def process_video(pool, video_path, args):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Error reading video file: {video_path}")
+        return None
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    started = time.perf_counter()
+    tasks = [(video_path, args.boxes, start, end)
+             for start, end in frame_ranges(frame_count, args.chunk_frames)]
+    chunks = sorted(pool.imap_unordered(score_range, tasks), key=lambda chunk: chunk[0])
+
+    # Reads may stop short only at the real end of the video (frame counts
+    # are often estimates); a gap before later frames would shift the timeline
+    expected = 0
+    for start, chunk in chunks:
+        if len(chunk) and start != expected:
+            print(f"Error reading video file: {video_path} (frames {expected}-{start - 1} unreadable)")
+            return None
+        expected = start + len(chunk)
+    if expected != frame_count:
+        print(f"Warning: {video_path} has {expected} readable frames, {frame_count} reported")
+
+    votes = np.concatenate([chunk for _, chunk in chunks]) if chunks else np.zeros((0, 0), np.uint8)
+
+    # The temporal filter is sequential, so it runs once over the merged votes
+    if args.filter and len(votes):
+        states = apply_filter(votes, mode=args.filter, window=args.window,
+                              required=args.required, alpha=args.alpha)
+    else:
+        states = votes >= 2
+    elapsed = time.perf_counter() - started
+
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    base = os.path.join(args.output_dir, name)
+    np.save(base + '.occupancy.npy', np.packbits(states, axis=1))
+
+    space_ids = [box['id'] for box in load_bounding_boxes(args.boxes)]
+    summary = {
+        'video': video_path,
+        'frames': len(states),
+        'reported_frame_count': frame_count,
+        'fps': fps,
+        'space_ids': space_ids,
+        'packing': 'numpy.packbits(axis=1, bitorder=big)',
+        'filter': args.filter,
+        'processing_seconds': round(elapsed, 3),
+        'realtime_factor': round(len(states) / fps / elapsed, 2) if fps and elapsed else None,
+    }
+    with open(base + '.occupancy.json', 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    if args.annotate:
+        write_annotated(video_path, args.boxes, states, base + '.annotated.mp4')
+    return summary
+
+
+def load_timeline(npy_path):
+    """Unpack a saved timeline into a (frames, spaces) bool array"""
+    with open(npy_path[:-len('.npy')] + '.json') as f:
+        summary = json.load(f)
+    packed = np.load(npy_path)
+    return np.unpackbits(packed, axis=1, count=len(summary['space_ids'])).astype(bool), summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help='video files or directories')
+    parser.add_argument('--boxes', default='bounding_boxes.json')
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-frames', type=int, default=DEFAULT_CHUNK_FRAMES)
+    parser.add_argument('--annotate', action='store_true', help='also write <name>.annotated.mp4')
+    parser.add_argument('--filter', choices=('nofm', 'ema'))
+    parser.add_argument('--window', type=int, default=5)
+    parser.add_argument('--required', type=int, default=4)
+    parser.add_argument('--alpha', type=float, default=0.3)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(args.workers, initializer=init_worker) as pool:
+        for video_path in find_videos(args.inputs):
+            summary = process_video(pool, video_path, args)
+            if summary:
+                print(json.dumps({key: summary[key] for key in
+                                  ('video', 'frames', 'processing_seconds', 'realtime_factor')}))
+
+
+if __name__ == '__main__':
+    main()
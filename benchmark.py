@@ -0,0 +1,247 @@
+"""Benchmark the detection and web hot paths on synthetic lots
+
+Every layout size runs in a fresh process with an in-memory SQLite
+database, a synthetic video and a grid of synthetic spaces, so results
+are reproducible for a given --seed and comparable between commits.
+
+    python benchmark.py --spaces 70 500 2000 --output bench.json
+    python benchmark.py --compare bench-main.json --output bench.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+import multiprocessing
+import cv2
+import numpy as np
+
+FRAME_SIZE = (1920, 1080)
+API_ROUTES = ('/api/parking_status', '/api/available_spaces', '/api/parking_recommendations')
+
+
+def synthetic_layout(num_spaces, frame_size=FRAME_SIZE):
+    """Grid of rectangular spaces in bounding_boxes.json format"""
+    frame_w, frame_h = frame_size
+    cols = max(int(math.ceil(math.sqrt(num_spaces * frame_w / frame_h))), 1)
+    rows = int(math.ceil(num_spaces / cols))
+    cell_w, cell_h = frame_w / cols, frame_h / rows
+    boxes = []
+    for i in range(num_spaces):
+        x0, y0 = (i % cols) * cell_w + 2, (i // cols) * cell_h + 2
+        x1, y1 = x0 + cell_w - 4, y0 + cell_h - 4
+        boxes.append({'id': i, 'points': [[int(x0), int(y0)], [int(x1), int(y0)],
+                                          [int(x1), int(y1)], [int(x0), int(y1)]]})
+    return boxes
+
+
+def synthetic_frames(boxes, count, seed, frame_size=FRAME_SIZE, churn=0.02):
+    """Asphalt-like frames with "cars" that arrive and leave over time"""
+    rng = np.random.default_rng(seed)
+    frame_w, frame_h = frame_size
+    background = rng.integers(70, 110, (frame_h, frame_w, 3), dtype=np.uint8)
+    occupied = rng.random(len(boxes)) < 0.5
+    colors = rng.integers(0, 256, (len(boxes), 3))
+
+    frames = []
+    for _ in range(count):
+        occupied ^= rng.random(len(boxes)) < churn
+        frame = background.copy()
+        for box, present, color in zip(boxes, occupied, colors):
+            if present:
+                (x0, y0), _, (x1, y1), _ = box['points']
+                inset_x, inset_y = (x1 - x0) // 6, (y1 - y0) // 6
+                cv2.rectangle(frame, (x0 + inset_x, y0 + inset_y), (x1 - inset_x, y1 - inset_y),
+                              tuple(int(c) for c in color), -1)
+        frames.append(frame)
+    return frames
+
+
+def write_video(path, frames, fps=25):
+    frame_h, frame_w = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (frame_w, frame_h))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+
+def latency_summary(seconds):
+    latencies = np.array(seconds, dtype=np.float64) * 1000.0
+    return {
+        'calls': len(latencies),
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max()),
+    }
+
+
+def time_calls(fn, args_list):
+    seconds = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        seconds.append(time.perf_counter() - started)
+    return latency_summary(seconds)
+
+
+def peak_memory(fn, args_list):
+    """Peak traced allocation (MiB) over a run; kept apart from the timings"""
+    tracemalloc.start()
+    try:
+        for args in args_list:
+            fn(*args)
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def run_size(num_spaces, num_frames, seed, requests):
+    """Benchmark one layout size; runs in its own process"""
+    from werkzeug.security import generate_password_hash
+    from sqlalchemy import event
+    from config import Config
+
+    Config.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    Config.SECRET_KEY = 'benchmark'
+    # Flush on every submit so queries per frame is the worst case
+    Config.DB_FLUSH_INTERVAL = 0
+    Config.CAMERAS_CONFIG = None
+
+    import app as web
+    from models import User
+    from parking_detection import ParkingDetector
+
+    boxes = synthetic_layout(num_spaces)
+    frames = synthetic_frames(boxes, num_frames, seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, 'synthetic.mp4')
+        json_path = os.path.join(tmp, 'boxes.json')
+        write_video(video_path, frames)
+        with open(json_path, 'w') as f:
+            json.dump(boxes, f)
+
+        # Recommendations are built from the synthetic layout, not the repo's
+        Config.BOUNDING_BOXES_PATH = json_path
+        flask_app = web.create_app()
+        with flask_app.app_context():
+            web.db.session.add(User(username='bench', email='bench@example.com',
+                                    password=generate_password_hash('bench', method='pbkdf2:sha256')))
+            web.db.session.commit()
+            engine = web.db.engine
+
+        started = time.perf_counter()
+        detector = ParkingDetector(video_path, json_path, flask_app)
+        setup_seconds = time.perf_counter() - started
+
+    report = {'spaces': num_spaces, 'frames': num_frames, 'setup_s': setup_seconds}
+    assert len(web.recommendation_engine.centroids) == num_spaces, "Recommendations use the wrong layout"
+
+    # Detection: first pass warms caches, second is measured
+    results = [detector.detect_occupancy(frame) for frame in frames]
+    started = time.perf_counter()
+    detect = time_calls(detector.detect_occupancy, [(frame,) for frame in frames])
+    report['detect_occupancy'] = detect
+    report['detect_fps'] = num_frames / (time.perf_counter() - started)
+    report['detect_peak_mib'] = peak_memory(detector.detect_occupancy, [(frame,) for frame in frames[:5]])
+
+    report['draw_bounding_boxes'] = time_calls(
+        detector.draw_bounding_boxes, [(frame.copy(), result) for frame, result in zip(frames, results)])
+
+    # Persistence, counting SQL statements issued per frame
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(1))
+    report['update_parking_status'] = time_calls(detector.update_parking_status, [(result,) for result in results])
+    report['queries_per_frame'] = len(statements) / num_frames
+
+    # Read APIs, cold (full body) and conditional (304 via ETag)
+    client = flask_app.test_client()
+    client.post('/login', data={'email': 'bench@example.com', 'password': 'bench'})
+    assert client.get(API_ROUTES[0]).status_code == 200, "Benchmark login failed"
+    report['api'] = {}
+    for route in API_ROUTES:
+        del statements[:]
+        etag = client.get(route).headers.get('ETag')
+        report['api'][route] = {
+            'full': time_calls(client.get, [(route,)] * requests),
+            'not_modified': time_calls(lambda: client.get(route, headers={'If-None-Match': etag}),
+                                       [()] * requests),
+            'queries_per_request': len(statements) / (2 * requests + 1),
+        }
+
+    detector.release()
+    return report
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current):
+    """Print p50 ratios (current / baseline) for every shared measurement"""
+    previous = {size['spaces']: size for size in baseline['results']}
+    for size in current['results']:
+        old = previous.get(size['spaces'])
+        if old is None:
+            continue
+        print(f"{size['spaces']} spaces (baseline {baseline.get('revision')}):")
+        for name in ('detect_occupancy', 'draw_bounding_boxes', 'update_parking_status'):
+            if name in old:
+                ratio = size[name]['p50_ms'] / old[name]['p50_ms'] if old[name]['p50_ms'] else float('inf')
+                print(f"  {name:24s} {old[name]['p50_ms']:9.3f} -> {size[name]['p50_ms']:9.3f} ms  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--spaces', type=int, nargs='+', default=[70, 500, 2000])
+    parser.add_argument('--frames', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200, help='requests per API route')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', help='baseline JSON report to compare against')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for num_spaces in args.spaces:
+        with context.Pool(1) as pool:
+            report = pool.apply(run_size, (num_spaces, args.frames, args.seed, args.requests))
+        results.append(report)
+        print(f"{num_spaces:5d} spaces: {report['detect_fps']:7.1f} fps, "
+              f"detect p50 {report['detect_occupancy']['p50_ms']:.2f} ms, "
+              f"draw p50 {report['draw_bounding_boxes']['p50_ms']:.2f} ms, "
+              f"{report['queries_per_frame']:.2f} queries/frame", file=sys.stderr)
+
+    output = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+        'seed': args.seed,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    else:
+        print(json.dumps(output, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import json
+import queue
+import time
+import multiprocessing
+import cv2
+from occupancy_writer import OccupancyWriter
+
+# Space ids of camera N start at N * CAMERA_SPACE_STRIDE unless configured
+CAMERA_SPACE_STRIDE = 1000
+
+
+class CameraConfig:
+    """Video source and slot layout for one camera"""
+
+    def __init__(self, camera_id, video_path, json_path, space_offset=0, max_fps=None):
+        self.camera_id = camera_id
+        self.video_path = video_path
+        self.json_path = json_path
+        self.space_offset = space_offset
+        self.max_fps = max_fps
+
+    @classmethod
+    def from_dict(cls, data, index=0):
+        return cls(
+            camera_id=data.get('id', f'cam{index}'),
+            video_path=data['video'],
+            json_path=data['boxes'],
+            space_offset=data.get('space_offset', index * CAMERA_SPACE_STRIDE),
+            max_fps=data.get('max_fps'),
+        )
+
+    def namespaced_ids(self, space_ids):
+        """Map a camera's local space ids to lot-wide ids"""
+        return [self.space_offset + space_id for space_id in space_ids]
+
+
+def load_camera_configs(path):
+    """Load a JSON list of ``{"id", "video", "boxes", ...}`` camera entries"""
+    with open(path) as f:
+        entries = json.load(f)
+    return [CameraConfig.from_dict(entry, i) for i, entry in enumerate(entries)]
+
+
+class CameraResult:
+    """Occupancy vector produced by a camera worker for one frame"""
+
+    def __init__(self, camera_id, frame_index, timestamp, space_ids, occupied):
+        self.camera_id = camera_id
+        self.frame_index = frame_index
+        self.timestamp = timestamp
+        self.space_ids = space_ids
+        self.occupied = occupied
+
+
+def camera_worker(config, result_queue, stop_event, detector_options=None):
+    """Run one ParkingDetector in its own process and report results"""
+    from parking_detection import ParkingDetector
+
+    # One process per camera already uses every core; OpenCV's own thread
+    # pool in each of them would only oversubscribe the CPU
+    cv2.setNumThreads(1)
+    detector = ParkingDetector(config.video_path, config.json_path)
+    # Motion gate, background model and temporal filter, as configured
+    detector.configure(**(detector_options or {}))
+    space_ids = config.namespaced_ids(detector.layout.space_ids)
+    interval = 1.0 / config.max_fps if config.max_fps else 0
+    frame_index = 0
+
+    try:
+        while not stop_event.is_set():
+            started = time.monotonic()
+            frame = detector.read_frame()
+            if frame is None:
+                break
+
+            results = detector.detect_occupancy_gated(frame)
+            result = CameraResult(config.camera_id, frame_index, time.time(), space_ids, results)
+            try:
+                result_queue.put_nowait(result)
+            except queue.Full:
+                # The web process is behind; drop rather than stall detection
+                pass
+            frame_index += 1
+
+            if interval:
+                remaining = interval - (time.monotonic() - started)
+                if remaining > 0:
+                    time.sleep(remaining)
+    finally:
+        detector.release()
+
+
+class CameraWorkerPool:
+    """One detection process per camera, reporting over a shared queue
+
+    ``detector_options`` are passed to ``ParkingDetector.configure`` in
+    every worker.
+    """
+
+    def __init__(self, cameras, queue_size=256, detector_options=None):
+        self.cameras = list(cameras)
+        self.detector_options = detector_options or {}
+        self._context = multiprocessing.get_context('spawn')
+        self.result_queue = self._context.Queue(maxsize=queue_size)
+        self.stop_event = self._context.Event()
+        self.processes = {}
+
+        # Per-camera counters maintained by the consuming process
+        self.frames = {camera.camera_id: 0 for camera in self.cameras}
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        for camera in self.cameras:
+            process = self._context.Process(
+                target=camera_worker,
+                args=(camera, self.result_queue, self.stop_event, self.detector_options),
+                name=f'camera-{camera.camera_id}',
+                daemon=True,
+            )
+            process.start()
+            self.processes[camera.camera_id] = process
+
+    def get(self, timeout=None):
+        """Return the next CameraResult, or None on timeout"""
+        try:
+            result = self.result_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.frames[result.camera_id] = self.frames.get(result.camera_id, 0) + 1
+        return result
+
+    def fps(self):
+        """Frames/sec received per camera since start"""
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        if elapsed <= 0:
+            return {camera_id: 0.0 for camera_id in self.frames}
+        return {camera_id: count / elapsed for camera_id, count in self.frames.items()}
+
+    def stop(self, timeout=5):
+        self.stop_event.set()
+        for process in self.processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes = {}
+
+
+class CameraResultSink:
+    """Applies camera results to the database in the web process"""
+
+    def __init__(self, app, flush_interval=1.0):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.writers = {}
+
+    def apply(self, result):
+        writer = self.writers.get(result.camera_id)
+        if writer is None:
+            writer = OccupancyWriter(self.app, result.space_ids, self.flush_interval)
+            self.writers[result.camera_id] = writer
+        return writer.submit(result.occupied)
+
+    def flush(self):
+        for writer in self.writers.values():
+            writer.flush()
@@ -0,0 +1,72 @@
+"""Compile bounding_boxes.json into a memory-mappable binary layout
+
+The frame size comes from --video or --size. The layout is validated
+first: duplicate ids, degenerate polygons, polygons partly or wholly
+outside the frame, and overlapping spaces are reported, and with
+--strict any of them aborts the conversion.
+
+    python compile_layout.py bounding_boxes.json --video carPark.mp4
+    python compile_layout.py bounding_boxes.json --size 1920x1080 -o lot.layout --strict
+"""
+import os
+import sys
+import json
+import argparse
+import cv2
+from parking_layout import ParkingLayout, load_bounding_boxes
+
+# Overlaps below this fraction of the smaller space are only reported
+DEFAULT_MAX_OVERLAP = 0.05
+
+
+def frame_shape_from_args(args):
+    if args.size:
+        width, height = (int(v) for v in args.size.lower().split('x'))
+        return height, width
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        raise SystemExit(f"Error reading video file: {args.video}")
+    shape = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    cap.release()
+    return shape
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('boxes')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--video', help='take the frame size from this video')
+    source.add_argument('--size', help='frame size as WIDTHxHEIGHT')
+    parser.add_argument('-o', '--output', help='default: <boxes>.layout')
+    parser.add_argument('--max-overlap', type=float, default=DEFAULT_MAX_OVERLAP,
+                        help='overlap ratio treated as an error')
+    parser.add_argument('--strict', action='store_true', help='refuse to write a layout with errors')
+    args = parser.parse_args()
+
+    frame_shape = frame_shape_from_args(args)
+    layout = ParkingLayout(load_bounding_boxes(args.boxes), frame_shape)
+
+    issues = layout.validate()
+    errors = [issue for issue in issues
+              if issue['type'] != 'overlap' or issue['ratio'] > args.max_overlap]
+    for issue in issues:
+        level = 'error' if issue in errors else 'warning'
+        print(f"{level}: {json.dumps(issue)}", file=sys.stderr)
+
+    if errors and args.strict:
+        raise SystemExit(f"{len(errors)} layout errors; nothing written")
+
+    output = args.output or os.path.splitext(args.boxes)[0] + '.layout'
+    layout.save(output)
+    print(json.dumps({
+        'output': output,
+        'spaces': len(layout),
+        'frame_shape': list(frame_shape),
+        'bytes': os.path.getsize(output),
+        'errors': len(errors),
+        'warnings': len(issues) - len(errors),
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,3 +7,69 @@ class Config:
     UPLOAD_FOLDER = 'static/uploads'
 
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+
+    # Detection pipeline: capture rate cap and inter-stage queue behaviour
+    PIPELINE_MAX_FPS = 30
+    PIPELINE_QUEUE_SIZE = 2
+    PIPELINE_DROP_OLDEST = True
+
+    # Motion gate: skip detection on still frames, re-detect between
+    # MIN_FPS (quiet lot refresh) and MAX_FPS (while things move)
+    MOTION_GATE_ENABLED = True
+    MOTION_GATE_SCALE = 0.25
+    MOTION_GATE_MIN_FPS = 0.5
+    MOTION_GATE_MAX_FPS = 15
+
+    # Temporal filter on slot decisions: 'nofm' (N of the last M frames),
+    # 'ema' (moving average with hysteresis) or None to disable
+    OCCUPANCY_FILTER_MODE = 'nofm'
+    OCCUPANCY_FILTER_WINDOW = 5
+    OCCUPANCY_FILTER_REQUIRED = 4
+    OCCUPANCY_FILTER_ALPHA = 0.3
+
+    # Rolling background model: median of BOOTSTRAP_FRAMES sampled frames,
+    # then a running average over free pixels every UPDATE_INTERVAL seconds
+    BACKGROUND_MODEL_ENABLED = True
+    BACKGROUND_BOOTSTRAP_FRAMES = 15
+    BACKGROUND_ALPHA = 0.05
+    BACKGROUND_UPDATE_INTERVAL = 2.0
+
+    # Seconds a logged-in user's record is cached between database lookups
+    USER_CACHE_TTL = 60
+
+    # Seconds between batched writes of occupancy transitions
+    DB_FLUSH_INTERVAL = 1.0
+
+    # Slot layout used for spatial recommendations (single-camera mode only;
+    # with CAMERAS_CONFIG the snapshot's recommendations are served)
+    BOUNDING_BOXES_PATH = 'bounding_boxes.json'
+    # Entrances ([{"id", "point": [x, y]}], None = top-left corner) and
+    # zones ([{"id", "points": [[x, y], ...]}]) in frame coordinates
+    PARKING_ENTRANCES = None
+    PARKING_ZONES = None
+
+    # Occupancy rollups: checkpoint period (s) and retention (days, 0 = keep).
+    # History older than the rollups is rolled up before any raw row is deleted
+    ROLLUP_INTERVAL = 60
+    HISTORY_RETENTION_DAYS = 30
+    HOURLY_ROLLUP_RETENTION_DAYS = 90
+
+    # Server-Sent Events: full-snapshot resync and keepalive periods (s)
+    EVENTS_RESYNC_INTERVAL = 60
+    EVENTS_KEEPALIVE_INTERVAL = 15
+
+    # Prometheus metrics at /metrics; timers cost one attribute check when off
+    METRICS_ENABLED = True
+    # Seconds between stack samples of the runtime-toggled profiler
+    PROFILER_INTERVAL = 0.005
+
+    # On-demand /api/process_frame jobs: how many are kept and for how long (s)
+    FRAME_JOBS_MAX = 64
+    FRAME_JOBS_TTL = 300
+
+    # Default /video_feed preset: 'high', 'medium' or 'low'
+    VIDEO_FEED_PRESET = 'high'
+
+    # Multi-camera mode: JSON list of {"id", "video", "boxes"} entries
+    CAMERAS_CONFIG = os.environ.get('PARKING_CAMERAS')
+    CAMERA_QUEUE_SIZE = 256
@@ -0,0 +1,31 @@
+import json
+import cv2
+import pytest
+from parking_detection import ParkingDetector
+
+
+@pytest.fixture
+def make_detector(tmp_path):
+    """Factory building a ParkingDetector over a clip of frames and a layout"""
+    detectors = []
+
+    def make(frames, boxes):
+        index = len(detectors)
+        frame_h, frame_w = frames[0].shape[:2]
+        video_path = str(tmp_path / f'clip{index}.avi')
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (frame_w, frame_h))
+        for frame in frames:
+            writer.write(frame)
+        writer.release()
+
+        json_path = str(tmp_path / f'boxes{index}.json')
+        with open(json_path, 'w') as f:
+            json.dump(boxes, f)
+
+        detector = ParkingDetector(video_path, json_path)
+        detectors.append(detector)
+        return detector
+
+    yield make
+    for detector in detectors:
+        detector.release()
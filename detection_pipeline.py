@@ -0,0 +1,325 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+from motion_gate import MotionGate
+from metrics import registry
+
+
+class QueueClosed(Exception):
+    pass
+
+
+class BoundedQueue:
+    """Thread-safe bounded queue between pipeline stages
+
+    With ``drop_oldest`` a full queue discards its oldest item to make room,
+    so a slow consumer always sees the most recent frames; otherwise
+    ``put`` blocks until there is space.
+    """
+
+    def __init__(self, name, maxsize=2, drop_oldest=True):
+        self.name = name
+        self.maxsize = max(int(maxsize), 1)
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self._items = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            while len(self._items) >= self.maxsize and not self._closed:
+                if self.drop_oldest:
+                    self._items.popleft()
+                    self.dropped += 1
+                    break
+                self._cond.wait()
+            if self._closed:
+                raise QueueClosed(self.name)
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def get_many(self, max_items=1, timeout=None):
+        """Wait for at least one item and return up to max_items of them"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return []
+            if not self._items:
+                raise QueueClosed(self.name)
+            items = [self._items.popleft() for _ in range(min(max_items, len(self._items)))]
+            self._cond.notify_all()
+            return items
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        return {'depth': len(self._items), 'maxsize': self.maxsize, 'dropped': self.dropped}
+
+
+class StageStats:
+    """Processing counters and a rolling latency window for one stage"""
+
+    def __init__(self, window=256):
+        self.processed = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, items=1):
+        with self._lock:
+            self.processed += items
+            self.latencies.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self.latencies, dtype=np.float64) * 1000.0
+            processed, errors = self.processed, self.errors
+        result = {'processed': processed, 'errors': errors}
+        if len(latencies):
+            result.update({
+                'last_ms': float(latencies[-1]),
+                'mean_ms': float(latencies.mean()),
+                'p50_ms': float(np.percentile(latencies, 50)),
+                'p95_ms': float(np.percentile(latencies, 95)),
+                'max_ms': float(latencies.max()),
+            })
+        return result
+
+
+class FramePacket:
+    """A frame and everything derived from it as it moves down the pipeline"""
+
+    def __init__(self, index, frame):
+        self.index = index
+        self.frame = frame
+        self.captured_at = time.monotonic()
+        self.features = None
+        self.results = None
+        self.skipped = False
+
+
+class PipelineStage(threading.Thread):
+    """Worker thread that applies fn to items from inbox and fans out results
+
+    ``fn`` receives a list of up to ``batch_size`` items and returns the
+    list of items to forward (or None to forward nothing).
+    """
+
+    def __init__(self, name, fn, inbox, outboxes=(), batch_size=1):
+        super().__init__(name=f'pipeline-{name}', daemon=True)
+        self.stage_name = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outboxes = list(outboxes)
+        self.batch_size = max(int(batch_size), 1)
+        self.stats = StageStats()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                items = self.inbox.get_many(self.batch_size, timeout=0.5)
+            except QueueClosed:
+                break
+            if not items:
+                continue
+
+            started = time.perf_counter()
+            try:
+                outputs = self.fn(items)
+            except Exception as e:
+                self.stats.errors += 1
+                print(f"Error in pipeline stage {self.stage_name}: {e}")
+                continue
+            self.stats.record(time.perf_counter() - started, len(items))
+
+            for item in outputs or ():
+                for outbox in self.outboxes:
+                    try:
+                        outbox.put(item)
+                    except QueueClosed:
+                        return
+
+
+class CaptureStage(PipelineStage):
+    """Source stage: reads frames from the detector at up to max_fps"""
+
+    def __init__(self, detector, outbox, max_fps=None):
+        super().__init__('capture', None, None, [outbox])
+        self.detector = detector
+        self.interval = 1.0 / max_fps if max_fps else 0
+        self._index = 0
+
+    def run(self):
+        next_due = time.monotonic()
+        while not self._stop_event.is_set():
+            if self.interval:
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                # Don't try to catch up after a stall; just keep the rate
+                next_due = max(next_due + self.interval, time.monotonic())
+
+            started = time.perf_counter()
+            try:
+                with registry.timer('stage', stage='capture'):
+                    frame = self.detector.read_frame()
+            except Exception as e:
+                self.stats.errors += 1
+                print(f"Error in pipeline stage capture: {e}")
+                time.sleep(1)
+                continue
+            if frame is None:
+                time.sleep(0.1)
+                continue
+            self.stats.record(time.perf_counter() - started)
+
+            try:
+                self.outboxes[0].put(FramePacket(self._index, frame))
+            except QueueClosed:
+                return
+            self._index += 1
+
+
+class DetectionPipeline:
+    """Capture -> features -> scoring -> (annotate, persist) on separate threads
+
+    Stages are connected by BoundedQueue instances; ``queue_size`` and
+    ``drop_oldest`` apply to all of them. ``on_frame`` is called with each
+    annotated frame and ``on_results`` with each packet after persistence.
+    If ``should_annotate`` is given and returns False (e.g. nobody is
+    watching the feed), frames are not drawn unless a FrameJobQueue passed
+    as ``jobs`` has pending on-demand requests.
+    """
+
+    def __init__(self, detector, max_fps=None, queue_size=2, drop_oldest=True,
+                 on_frame=None, on_results=None, should_annotate=None, jobs=None):
+        self.detector = detector
+        self.on_frame = on_frame
+        self.on_results = on_results
+        self.should_annotate = should_annotate
+        self.jobs = jobs
+        self.annotations_skipped = 0
+        self.started_at = None
+        self._last_results = None
+        self._dirty_log = {}
+        self._dirty_lock = threading.Lock()
+
+        def make_queue(name):
+            return BoundedQueue(name, queue_size, drop_oldest)
+
+        self.queues = {name: make_queue(name) for name in ('features', 'scoring', 'annotate', 'persist')}
+        self.stages = [
+            CaptureStage(detector, self.queues['features'], max_fps),
+            PipelineStage('features', self._extract, self.queues['features'], [self.queues['scoring']]),
+            PipelineStage('scoring', self._score, self.queues['scoring'],
+                          [self.queues['annotate'], self.queues['persist']],
+                          batch_size=getattr(detector, 'batch_size', 1)),
+            PipelineStage('annotate', self._annotate, self.queues['annotate']),
+            PipelineStage('persist', self._persist, self.queues['persist'], batch_size=queue_size),
+        ]
+
+    def _extract(self, packets):
+        gate = self.detector.motion_gate
+        for packet in packets:
+            if gate is not None:
+                dirty = gate.check(packet.frame, pending=self.detector.filter_pending())
+                if dirty is None:
+                    # Nothing moved: reuse the previous results downstream
+                    packet.skipped = True
+                    continue
+                with self._dirty_lock:
+                    self._dirty_log[packet.index] = dirty
+            packet.features = self.detector.compute_features(packet.frame)
+        return packets
+
+    def _score(self, packets):
+        scored = [packet for packet in packets if not packet.skipped]
+        if scored:
+            results = self.detector.score_features_batch([packet.features for packet in scored])
+            for packet, result in zip(scored, results):
+                packet.results = result
+                # Features are no longer needed; let the frame buffers go
+                packet.features = None
+
+        forwarded = []
+        for packet in packets:
+            if packet.skipped:
+                packet.results = self._last_results
+            elif self.detector.motion_gate is not None:
+                dirty = self._take_dirty(packet.index)
+                if dirty is not None:
+                    packet.results = MotionGate.merge(self._last_results, packet.results, dirty)
+            if packet.results is None:
+                continue
+            self._last_results = packet.results
+            forwarded.append(packet)
+        return forwarded
+
+    def _take_dirty(self, index):
+        """Union of dirty spaces up to index, including dropped packets'"""
+        with self._dirty_lock:
+            indexes = [i for i in self._dirty_log if i <= index]
+            masks = [self._dirty_log.pop(i) for i in indexes]
+        if not masks:
+            return None
+        return np.logical_or.reduce(masks)
+
+    def _annotate(self, packets):
+        jobs_waiting = self.jobs is not None and self.jobs.has_pending()
+        if not jobs_waiting and self.should_annotate is not None and not self.should_annotate():
+            self.annotations_skipped += len(packets)
+            return
+        for packet in packets:
+            annotated = self.detector.draw_bounding_boxes(packet.frame.copy(), packet.results)
+            if self.on_frame:
+                self.on_frame(annotated, packet)
+            if jobs_waiting:
+                self.jobs.complete(packet, annotated)
+
+    def _persist(self, packets):
+        # Only the newest state matters when several packets are waiting
+        packet = packets[-1]
+        self.detector.update_parking_status(packet.results)
+        if self.on_results:
+            self.on_results(packet)
+
+    def start(self):
+        self.started_at = time.monotonic()
+        for stage in self.stages:
+            stage.start()
+
+    def fps(self):
+        """Frames/sec captured since start"""
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        return self.stages[0].stats.processed / elapsed if elapsed > 0 else 0.0
+
+    def stop(self, timeout=2):
+        for stage in self.stages:
+            stage.stop()
+        for q in self.queues.values():
+            q.close()
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def stats(self):
+        stats = {
+            'stages': {stage.stage_name: stage.stats.snapshot() for stage in self.stages},
+            'queues': {name: q.stats() for name, q in self.queues.items()},
+            'annotations_skipped': self.annotations_skipped,
+        }
+        if self.detector.motion_gate is not None:
+            stats['motion_gate'] = self.detector.motion_gate.stats()
+        if self.detector.background_model is not None:
+            stats['background_model'] = self.detector.background_model.stats()
+        return stats
@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+from collections import deque
+
+
+def _isoformat(timestamp):
+    return timestamp.isoformat() if timestamp else None
+
+
+def format_event(event, data):
+    """Encode one Server-Sent Event; data is already-serialized JSON bytes"""
+    return b'event: ' + event.encode('ascii') + b'\ndata: ' + data + b'\n\n'
+
+
+class EventBroker:
+    """Fans occupancy transitions out to Server-Sent Events subscribers
+
+    Each change event is encoded once into a bounded, sequence-numbered
+    log; subscribers block until the log advances and then send what they
+    have not seen. A subscriber that falls behind the log, or has not had
+    a full snapshot for ``resync_interval`` seconds, is sent the current
+    snapshot instead. Every event carries the default recommendations
+    body, so clients never have to re-fetch it; ``recommendations`` is a
+    callable returning it as JSON bytes (by default the snapshot's).
+    """
+
+    def __init__(self, snapshot_store, resync_interval=60, keepalive_interval=15, log_size=256,
+                 recommendations=None):
+        self.snapshot_store = snapshot_store
+        self.recommendations = recommendations
+        self.resync_interval = resync_interval
+        self.keepalive_interval = keepalive_interval
+        self._log = deque(maxlen=log_size)
+        self._sequence = 0
+        self._state = {}
+        self._cond = threading.Condition()
+        self._snapshot_event = (None, None)
+        self.subscribers = 0
+
+    def recommendations_json(self):
+        if self.recommendations is not None:
+            return self.recommendations()
+        return self.snapshot_store.current().recommendations_json
+
+    def publish(self, transitions):
+        """Occupancy listener: queue an event for spaces that really changed"""
+        with self._cond:
+            changed = []
+            for space_id, occupied, timestamp in transitions:
+                occupied = bool(occupied)
+                if self._state.get(space_id) != occupied:
+                    self._state[space_id] = occupied
+                    changed.append({'id': space_id, 'occupied': occupied,
+                                    'last_updated': _isoformat(timestamp)})
+            if not changed:
+                return
+
+            data = (b'{"version":' + str(self.snapshot_store.current().version).encode('ascii') +
+                    b',"spaces":' + json.dumps(changed, separators=(',', ':')).encode('utf-8') +
+                    b',"recommendations":' + self.recommendations_json() + b'}')
+            self._sequence += 1
+            self._log.append((self._sequence, format_event('change', data)))
+            self._cond.notify_all()
+
+    def snapshot_event(self):
+        """Full-state event for the current snapshot, encoded once per version"""
+        snapshot = self.snapshot_store.current()
+        version, event = self._snapshot_event
+        if version != snapshot.version:
+            data = (b'{"version":' + str(snapshot.version).encode('ascii') +
+                    b',"spaces":' + snapshot.status_json +
+                    b',"recommendations":' + self.recommendations_json() + b'}')
+            event = format_event('snapshot', data)
+            self._snapshot_event = (snapshot.version, event)
+        return event
+
+    def _pending(self, last_seen):
+        """Events after last_seen, or None if some were already evicted"""
+        if self._log and self._log[0][0] > last_seen + 1:
+            return None
+        return [(sequence, event) for sequence, event in self._log if sequence > last_seen]
+
+    def stream(self):
+        """Generator of SSE bytes for one client"""
+        with self._cond:
+            self.subscribers += 1
+            last_seen = self._sequence
+        try:
+            yield b'retry: 2000\n\n' + self.snapshot_event()
+            last_resync = time.monotonic()
+
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._sequence > last_seen, self.keepalive_interval)
+                    pending = self._pending(last_seen)
+                    sequence = self._sequence
+
+                if pending is None or time.monotonic() - last_resync >= self.resync_interval:
+                    # Fell behind the log or due a periodic resync
+                    last_seen = sequence
+                    last_resync = time.monotonic()
+                    yield self.snapshot_event()
+                elif pending:
+                    last_seen = pending[-1][0]
+                    yield b''.join(event for _, event in pending)
+                else:
+                    yield b': keepalive\n\n'
+        finally:
+            with self._cond:
+                self.subscribers -= 1
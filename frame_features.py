@@ -0,0 +1,71 @@
+import cv2
+
+
+class FrameFeatures:
+    """Full-frame features for one frame, each computed at most once"""
+
+    def __init__(self, frame, extractor):
+        self.frame = frame
+        self._extractor = extractor
+        self._cache = {}
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            producer = self._extractor.producers.get(name)
+            if producer is None:
+                raise KeyError(f"Unknown frame feature: {name}")
+            self._cache[name] = producer(self)
+        return self._cache[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def computed(self):
+        """Names of the features computed so far for this frame"""
+        return list(self._cache)
+
+
+def _gray(features):
+    return cv2.cvtColor(features.frame, cv2.COLOR_BGR2GRAY)
+
+
+def _blurred(features):
+    # Gaussian blur to reduce noise
+    return cv2.GaussianBlur(features.gray, (5, 5), 0)
+
+
+def _edges(features):
+    return cv2.Canny(features.gray, 50, 150)
+
+
+def _hsv(features):
+    return cv2.cvtColor(features.frame, cv2.COLOR_BGR2HSV)
+
+
+class FeatureExtractor:
+    """Registry of per-frame feature producers shared by all space scorers
+
+    A producer is a callable taking the FrameFeatures being built and
+    returning a full-frame array. Producers may depend on other features
+    through attribute access, e.g. ``features.gray``.
+    """
+
+    def __init__(self):
+        self.producers = {
+            'gray': _gray,
+            'blurred': _blurred,
+            'edges': _edges,
+            'hsv': _hsv,
+        }
+
+    def register(self, name, producer):
+        """Add or replace a feature producer"""
+        self.producers[name] = producer
+
+    def extract(self, frame):
+        return FrameFeatures(frame, self)
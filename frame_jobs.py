@@ -0,0 +1,103 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+import cv2
+
+
+class FrameJob:
+    """On-demand request for the next processed frame"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.monotonic()
+        self.status = 'pending'
+        self.frame_index = None
+        self.results = None
+        self.jpeg = None
+        self.error = None
+        self.finished_at = None
+
+    def to_dict(self):
+        data = {'job_id': self.id, 'status': self.status}
+        if self.status == 'done':
+            occupied = sum(self.results)
+            data.update({
+                'frame_index': self.frame_index,
+                'occupied': occupied,
+                'total': len(self.results),
+                'results': self.results,
+                'latency_ms': (self.finished_at - self.created_at) * 1000.0,
+            })
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+
+class FrameJobQueue:
+    """Jobs served by the detection pipeline's annotate stage
+
+    Web requests ``submit`` a job and return at once; the pipeline
+    completes every pending job with the first annotated frame captured
+    after the job was created, JPEG-encoded in memory. Finished jobs are
+    kept for ``ttl`` seconds, and at most ``max_jobs`` jobs are held.
+    """
+
+    def __init__(self, max_jobs=64, ttl=300, jpeg_quality=90):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.jpeg_quality = jpeg_quality
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            expired = job.finished_at is not None and now - job.finished_at > self.ttl
+            if not expired and len(self._jobs) < self.max_jobs:
+                break
+            self._jobs.popitem(last=False)
+            if job.status == 'pending':
+                self._pending -= 1
+
+    def submit(self):
+        job = FrameJob()
+        with self._lock:
+            self._expire(job.created_at)
+            self._jobs[job.id] = job
+            self._pending += 1
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def has_pending(self):
+        return self._pending > 0
+
+    def complete(self, packet, annotated):
+        """Finish pending jobs created before this packet was captured"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values()
+                    if job.status == 'pending' and job.created_at <= packet.captured_at]
+        if not jobs:
+            return 0
+
+        ret, jpeg = cv2.imencode('.jpg', annotated, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        jpeg = jpeg.tobytes() if ret else None
+        results = [bool(occupied) for occupied in packet.results]
+        now = time.monotonic()
+        with self._lock:
+            for job in jobs:
+                if job.status != 'pending' or self._jobs.get(job.id) is not job:
+                    # Expired while the frame was being encoded
+                    continue
+                self._pending -= 1
+                if ret:
+                    job.status, job.jpeg = 'done', jpeg
+                    job.frame_index, job.results = packet.index, results
+                else:
+                    job.status, job.error = 'failed', 'JPEG encoding failed'
+                job.finished_at = now
+        return len(jobs)
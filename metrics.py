@@ -0,0 +1,209 @@
+import sys
+import time
+import bisect
+import threading
+from collections import Counter
+
+# Latency buckets (seconds) shared by every timing histogram
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, rendered as a Prometheus histogram"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            yield f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}'
+        yield f'{name}_sum{_format_labels(labels)} {self.sum}'
+        yield f'{name}_count{_format_labels(labels)} {self.count}'
+
+
+class _Timer:
+    __slots__ = ('registry', 'name', 'labels', 'started')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.started, self.labels)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """Timing histograms and scrape-time collectors for /metrics
+
+    Hot paths wrap work in ``registry.timer(name, **labels)``; when the
+    registry is disabled that returns a shared no-op context manager, so
+    the only cost left is one attribute check. Collectors are callables
+    run at scrape time that yield ``(name, type, help, [(labels, value)])``
+    for values that already live elsewhere (queue depths, camera FPS).
+    """
+
+    def __init__(self, enabled=True, namespace='parking'):
+        self.enabled = enabled
+        self.namespace = namespace
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def timer(self, name, **labels):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, _label_key(labels))
+
+    def observe(self, name, value, labels=()):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram()
+            histogram.observe(value)
+
+    def add_collector(self, collector):
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def render(self):
+        """Everything in the Prometheus text exposition format"""
+        families = {}
+        with self._lock:
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                full_name = f'{self.namespace}_{name}_seconds'
+                families.setdefault(full_name, ('histogram', self._help.get(name), []))[2].extend(
+                    histogram.samples(full_name, labels))
+
+        for collector in self._collectors:
+            try:
+                collected = list(collector())
+            except Exception as e:
+                print(f"Error in metrics collector: {e}")
+                continue
+            for name, metric_type, help_text, samples in collected:
+                full_name = f'{self.namespace}_{name}'
+                families.setdefault(full_name, (metric_type, help_text, []))[2].extend(
+                    f'{full_name}{_format_labels(_label_key(labels))} {value}' for labels, value in samples)
+
+        lines = []
+        for name, (metric_type, help_text, samples) in families.items():
+            if help_text:
+                lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """Statistical profiler sampling every thread's stack at a fixed interval
+
+    Runs on its own daemon thread and can be started and stopped at
+    runtime. ``report`` returns collapsed stacks (``outer;inner count``
+    per line), the input format of flamegraph tools.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return False
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+        self.started_at = time.time()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if not self.running:
+            return False
+        self._stop_event.set()
+        self._thread.join()
+        return True
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stacks.append(';'.join(reversed(stack)))
+            with self._lock:
+                self.stacks.update(stacks)
+                self.samples += 1
+
+    def report(self, limit=None):
+        with self._lock:
+            top = self.stacks.most_common(limit)
+        return '\n'.join(f'{stack} {count}' for stack, count in top) + '\n'
+
+
+# Process-wide registry used by the detection and web hot paths
+registry = MetricsRegistry()
+registry.describe('stage', 'Time spent in each hot-path stage')
+registry.describe('scoring_method', 'Time spent in each occupancy scoring method')
+profiler = SamplingProfiler()
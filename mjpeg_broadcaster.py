@@ -0,0 +1,96 @@
+import threading
+import cv2
+from metrics import registry
+
+# name -> (JPEG quality, scale factor)
+QUALITY_PRESETS = {
+    'high': (95, 1.0),
+    'medium': (80, 0.75),
+    'low': (60, 0.5),
+}
+
+
+class FrameBroadcaster:
+    """Encodes each new frame once per quality preset and fans out the bytes
+
+    Producers call ``publish`` with a frame; a single encoder thread turns
+    it into a multipart JPEG chunk for every preset that currently has
+    viewers, outside the publishing lock. Each viewer's ``stream`` yields
+    the newest chunk it has not sent yet, so slow clients skip frames
+    instead of holding anyone up, and an unchanged frame is never resent.
+    """
+
+    def __init__(self, presets=None, default_preset='high'):
+        self.presets = dict(presets or QUALITY_PRESETS)
+        self.default_preset = default_preset
+        self._cond = threading.Condition()
+        self._frame = None
+        self._sequence = 0
+        self._encoded = {name: (0, None) for name in self.presets}
+        self._viewers = {name: 0 for name in self.presets}
+        self._encoder = None
+
+    def has_viewers(self):
+        return any(self._viewers.values())
+
+    def viewer_count(self):
+        return sum(self._viewers.values())
+
+    def publish(self, frame):
+        """Hand over a new frame; the broadcaster keeps a reference to it"""
+        with self._cond:
+            self._frame = frame
+            self._sequence += 1
+            self._cond.notify_all()
+
+    def _stale_presets(self):
+        return [name for name, count in self._viewers.items()
+                if count and self._encoded[name][0] < self._sequence]
+
+    def _encode_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._frame is not None and self._stale_presets())
+                frame, sequence, presets = self._frame, self._sequence, self._stale_presets()
+
+            chunks = {}
+            for name in presets:
+                quality, scale = self.presets[name]
+                with registry.timer('stage', stage='jpeg_encode', preset=name):
+                    image = frame
+                    if scale != 1.0:
+                        image = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                    ret, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                if ret:
+                    chunks[name] = (b'--frame\r\n'
+                                    b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n\r\n')
+
+            with self._cond:
+                for name in presets:
+                    # Record the sequence even on failure so we don't spin on it
+                    self._encoded[name] = (sequence, chunks.get(name, self._encoded[name][1]))
+                self._cond.notify_all()
+
+    def _ensure_encoder(self):
+        if self._encoder is None:
+            self._encoder = threading.Thread(target=self._encode_loop, name='mjpeg-encoder', daemon=True)
+            self._encoder.start()
+
+    def stream(self, preset=None):
+        """Generator of multipart JPEG chunks for one viewer"""
+        preset = preset if preset in self.presets else self.default_preset
+        with self._cond:
+            self._viewers[preset] += 1
+            self._ensure_encoder()
+            self._cond.notify_all()
+        last_sent = 0
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._encoded[preset][0] > last_sent)
+                    last_sent, chunk = self._encoded[preset]
+                if chunk is not None:
+                    yield chunk
+        finally:
+            with self._cond:
+                self._viewers[preset] -= 1
@@ -23,10 +23,33 @@ class ParkingSpace(db.Model):
         return f'<ParkingSpace {self.space_id} - {"Occupied" if self.is_occupied else "Available"}>'
 
 class ParkingHistory(db.Model):
+    # Time-range scans and per-space lookups (see analytics.ensure_indexes)
+    __table_args__ = (
+        db.Index('ix_parking_history_timestamp', 'timestamp'),
+        db.Index('ix_parking_history_space_timestamp', 'space_id', 'timestamp'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     space_id = db.Column(db.Integer, nullable=False)
     occupied = db.Column(db.Boolean, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<ParkingHistory {self.space_id} - {"Occupied" if self.occupied else "Available"} at {self.timestamp}>'
\ No newline at end of file
+        return f'<ParkingHistory {self.space_id} - {"Occupied" if self.occupied else "Available"} at {self.timestamp}>'
+
+class OccupancyRollup(db.Model):
+    """Occupied and observed seconds per space (or the whole lot) per bucket"""
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'space_id', 'bucket_start', name='uq_occupancy_rollup_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(8), nullable=False)  # 'hour' or 'day'
+    space_id = db.Column(db.Integer, nullable=False)  # LOT_SPACE_ID for the whole lot
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    occupied_seconds = db.Column(db.Float, nullable=False, default=0.0)
+    observed_seconds = db.Column(db.Float, nullable=False, default=0.0)
+    transitions = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<OccupancyRollup {self.granularity} {self.space_id} {self.bucket_start}>'
\ No newline at end of file
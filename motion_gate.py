@@ -0,0 +1,84 @@
+import time
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap motion check deciding when, and for which spaces, to re-detect
+
+    Every frame is downscaled and compared with the downscaled copy of the
+    last frame that went through full detection. ``check`` returns None
+    when detection can be skipped, or a boolean vector of the spaces whose
+    ROI changed. Detection runs at most ``max_fps`` times a second while
+    things move and at least ``min_fps`` times a second on a quiet lot, in
+    which case every space is re-scored. Spaces passed as ``pending``
+    (e.g. a temporal filter still confirming a change) are re-scored on
+    every frame the ``max_fps`` limit allows, however still the image is.
+    """
+
+    def __init__(self, layout, scale=0.25, pixel_threshold=20, space_ratio=0.03,
+                 min_fps=0.5, max_fps=15.0):
+        self.num_spaces = len(layout)
+        self.pixel_threshold = pixel_threshold
+        self.space_ratio = space_ratio
+        self.min_interval = 1.0 / min_fps if min_fps else float('inf')
+        self.max_interval = 1.0 / max_fps if max_fps else 0.0
+
+        frame_h, frame_w = layout.frame_shape
+        self.size = (max(int(frame_w * scale), 1), max(int(frame_h * scale), 1))
+        self.labels = cv2.resize(layout.labels, self.size, interpolation=cv2.INTER_NEAREST)
+        self.space_pixels = np.bincount(self.labels.ravel(), minlength=self.num_spaces + 1)[1:]
+
+        self.reference = None
+        self.last_detection = None
+        self.checked = 0
+        self.skipped = 0
+        self.forced = 0
+
+    def downscale(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def changed_spaces(self, small):
+        """Boolean vector of spaces that differ from the reference"""
+        moved = cv2.absdiff(small, self.reference) > self.pixel_threshold
+        changed = np.bincount(self.labels[moved], minlength=self.num_spaces + 1)[1:]
+        return (changed > self.space_ratio * self.space_pixels) & (self.space_pixels > 0)
+
+    def check(self, frame, now=None, pending=None):
+        """Return the spaces to re-score for this frame, or None to skip it"""
+        now = time.monotonic() if now is None else now
+        self.checked += 1
+        small = self.downscale(frame)
+
+        if self.reference is None or now - self.last_detection >= self.min_interval:
+            # First frame or periodic refresh: re-score everything
+            dirty = np.ones(self.num_spaces, dtype=bool)
+        elif now - self.last_detection < self.max_interval:
+            dirty = None
+        else:
+            dirty = self.changed_spaces(small)
+            if pending is not None and (pending & ~dirty).any():
+                # Keep feeding a decision that is still being confirmed
+                dirty |= pending
+                self.forced += 1
+            if not dirty.any():
+                dirty = None
+
+        if dirty is None:
+            self.skipped += 1
+            return None
+
+        self.reference = small
+        self.last_detection = now
+        return dirty
+
+    @staticmethod
+    def merge(previous, results, dirty):
+        """Take results for dirty spaces and keep previous ones elsewhere"""
+        if previous is None or len(previous) != len(results):
+            return list(results)
+        return [new if changed else old for old, new, changed in zip(previous, results, dirty)]
+
+    def stats(self):
+        return {'checked': self.checked, 'skipped': self.skipped, 'forced': self.forced}
@@ -0,0 +1,78 @@
+import numpy as np
+from metrics import registry
+
+# Squares of every uint8 value, used to accumulate sums of squares
+_SQUARES = (np.arange(256, dtype=np.uint32) ** 2).astype(np.uint16)
+
+
+class VectorizedScorer:
+    """Scores every parking space at once from a layout's label index
+
+    Each feature is gathered once over the pixels covered by parking
+    spaces and reduced per space with ``np.bincount``/``np.add.reduceat``,
+    so the cost per frame is a fixed number of NumPy passes regardless of
+    slot count.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.num_spaces = len(layout)
+        self._minlength = self.num_spaces + 1
+
+        pixel_counts = layout.pixel_counts[1:]
+        self._has_pixels = pixel_counts > 0
+        self._nonempty = np.flatnonzero(self._has_pixels)
+        self._starts = layout.segment_starts[self._nonempty]
+        self._counts = pixel_counts[self._nonempty].astype(np.float64)
+        self._areas = layout.areas
+        self._safe_areas = np.where(self._areas > 0, self._areas, 1.0)
+
+    def _gather(self, image):
+        """Values of image at every space pixel, in label-table order"""
+        if image.ndim == 3:
+            return np.take(image.reshape(-1, image.shape[2]), self.layout.pixel_index, axis=0)
+        return np.take(image.reshape(-1), self.layout.pixel_index)
+
+    def _count_nonzero(self, image):
+        """Per-space count of non-zero pixels in a single-channel image"""
+        hits = self._gather(image) > 0
+        counts = np.bincount(self.layout.pixel_labels[hits], minlength=self._minlength)
+        return counts[1:]
+
+    def changed_pixels(self, features):
+        """Method 1: pixels differing from the reference, per space"""
+        return self._count_nonzero(features.thresh)
+
+    def color_scores(self, features):
+        """Method 2: normalized mean HSV standard deviation, per space"""
+        scores = np.zeros(self.num_spaces, dtype=np.float64)
+        if len(self._nonempty) == 0:
+            return scores
+
+        # Per-space channel sums and sums of squares over each segment
+        hsv = self._gather(features.hsv)
+        total = np.add.reduceat(hsv, self._starts, axis=0, dtype=np.int64)
+        total_sq = np.add.reduceat(np.take(_SQUARES, hsv), self._starts, axis=0, dtype=np.int64)
+
+        counts = self._counts[:, None]
+        mean = total / counts
+        variance = np.maximum(total_sq / counts - mean * mean, 0.0)
+        color_variance = np.sqrt(variance).mean(axis=1)
+
+        scores[self._nonempty] = np.minimum(color_variance / 50.0, 1.0)
+        return scores
+
+    def edge_densities(self, features):
+        """Method 3: edge pixels per unit of polygon area, per space"""
+        edge_count = self._count_nonzero(features.edges)
+        return np.where(self._areas > 0, edge_count / self._safe_areas, 0.0)
+
+    def score(self, features):
+        """Return the number of methods (0-3) voting occupied, per space"""
+        with registry.timer('scoring_method', method='changed_pixels'):
+            threshold_1 = self.changed_pixels(features) > self._areas * 0.15
+        with registry.timer('scoring_method', method='color'):
+            threshold_2 = self.color_scores(features) > 0.4
+        with registry.timer('scoring_method', method='edge_density'):
+            threshold_3 = self.edge_densities(features) > 0.1
+        return threshold_1.astype(np.uint8) + threshold_2 + threshold_3
@@ -0,0 +1,107 @@
+import numpy as np
+
+
+class OccupancyFilter:
+    """Per-space temporal debouncing of raw occupancy decisions
+
+    Two modes, both O(spaces) per frame on plain NumPy arrays:
+
+    - ``'nofm'``: a space changes state only when at least ``required`` of
+      the last ``window`` raw decisions agree on the new state.
+    - ``'ema'``: an exponential moving average of the raw score (0-1) with
+      hysteresis; occupied above ``on_threshold``, free below
+      ``off_threshold``, unchanged in between.
+    """
+
+    def __init__(self, num_spaces, mode='nofm', window=5, required=4,
+                 alpha=0.3, on_threshold=0.6, off_threshold=0.4):
+        if mode not in ('nofm', 'ema'):
+            raise ValueError(f"Unknown occupancy filter mode: {mode}")
+        if mode == 'nofm' and not window // 2 < required <= window:
+            # With a minority threshold both states could be confirmed at once
+            raise ValueError("required must be more than half of window and at most window")
+
+        self.mode = mode
+        self.num_spaces = num_spaces
+        self.window = window
+        self.required = required
+        self.alpha = alpha
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.reset()
+
+    def reset(self, state=None):
+        """Forget history; optionally start from a known state vector"""
+        self.state = None if state is None else np.asarray(state, dtype=bool).copy()
+        # N-of-M: ring buffer of raw decisions and running occupied counts
+        self.history = np.zeros((self.window, self.num_spaces), dtype=bool)
+        self.occupied_counts = np.zeros(self.num_spaces, dtype=np.int32)
+        self.filled = 0
+        self.position = 0
+        # EMA of raw scores, and the latest raw scores
+        self.ema = None if self.state is None else self.state.astype(np.float32)
+        self.last_scores = None
+        # Consecutive updates each space has spent unconfirmed
+        self.pending_samples = np.zeros(self.num_spaces, dtype=np.int32)
+
+    def update(self, occupied, scores=None):
+        """Feed one frame of raw decisions; returns the filtered state"""
+        occupied = np.asarray(occupied, dtype=bool)
+        if self.state is None:
+            self.state = occupied.copy()
+
+        if self.mode == 'nofm':
+            self._update_nofm(occupied)
+        else:
+            scores = occupied if scores is None else scores
+            self._update_ema(np.asarray(scores, dtype=np.float32))
+        self.pending_samples = np.where(self._unconfirmed(), self.pending_samples + 1, 0)
+        return self.state
+
+    def _update_nofm(self, occupied):
+        if self.filled == self.window:
+            self.occupied_counts -= self.history[self.position]
+        else:
+            self.filled += 1
+        self.history[self.position] = occupied
+        self.occupied_counts += occupied
+        self.position = (self.position + 1) % self.window
+
+        free_counts = self.filled - self.occupied_counts
+        self.state[self.occupied_counts >= self.required] = True
+        self.state[free_counts >= self.required] = False
+
+    def _update_ema(self, scores):
+        self.last_scores = scores
+        if self.ema is None:
+            self.ema = scores.copy()
+        else:
+            self.ema += self.alpha * (scores - self.ema)
+        self.state[self.ema >= self.on_threshold] = True
+        self.state[self.ema <= self.off_threshold] = False
+
+    def pending(self):
+        """Spaces whose raw decisions disagree with the state but have not
+        yet been confirmed; they need more frames to settle either way
+
+        A space stops being reported after ``window`` unconfirmed updates,
+        so one that keeps flickering does not demand detection forever.
+        """
+        return (self.pending_samples > 0) & (self.pending_samples <= self.window)
+
+    def _unconfirmed(self):
+        if self.mode == 'nofm':
+            disagreeing = np.where(self.state, self.filled - self.occupied_counts, self.occupied_counts)
+            return (disagreeing > 0) & (disagreeing < self.required)
+        if self.last_scores is None:
+            return np.zeros(self.num_spaces, dtype=bool)
+        return np.where(self.state, self.last_scores <= self.off_threshold,
+                        self.last_scores >= self.on_threshold)
+
+
+def count_flips(states):
+    """Number of per-space state changes across a (frames, spaces) array"""
+    states = np.asarray(states, dtype=bool)
+    if len(states) < 2:
+        return 0
+    return int(np.count_nonzero(states[1:] != states[:-1]))
@@ -0,0 +1,104 @@
+import json
+import uuid
+import threading
+from collections import namedtuple
+from datetime import datetime
+from models import ParkingSpace, db
+
+# Attribute names match ParkingSpace so templates can render either
+SpaceStatus = namedtuple('SpaceStatus', ['space_id', 'is_occupied', 'last_updated'])
+
+# Number of free spaces suggested by /api/parking_recommendations
+RECOMMENDATION_COUNT = 3
+
+
+def _isoformat(timestamp):
+    return timestamp.isoformat() if timestamp else None
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+class OccupancySnapshot:
+    """Immutable, versioned view of every space with pre-encoded API bodies"""
+
+    def __init__(self, version, spaces, etag):
+        self.version = version
+        self.spaces = tuple(spaces)
+        self.etag = etag
+        self.created_at = datetime.utcnow()
+
+        available = [space for space in self.spaces if not space.is_occupied]
+        self.available = tuple(available)
+
+        self.status_json = _dumps([{
+            'id': space.space_id,
+            'occupied': space.is_occupied,
+            'last_updated': _isoformat(space.last_updated)
+        } for space in self.spaces])
+
+        self.available_json = _dumps({
+            'available_spaces': [{
+                'space_id': space.space_id,
+                'last_updated': _isoformat(space.last_updated)
+            } for space in available]
+        })
+
+        if available:
+            best_spots = [space.space_id for space in available[:RECOMMENDATION_COUNT]]
+            recommendations = {
+                'available': True,
+                'total_available': len(available),
+                'best_spots': best_spots,
+                'message': f'Recommended spots: {", ".join(map(str, best_spots))}'
+            }
+        else:
+            recommendations = {
+                'available': False,
+                'message': 'No parking spaces available'
+            }
+        self.recommendations_json = _dumps(recommendations)
+
+
+class SnapshotStore:
+    """Holds the current OccupancySnapshot and publishes new versions
+
+    Writers call ``apply`` with ``(space_id, occupied, timestamp)``
+    transitions; readers call ``current`` and never touch the database.
+    """
+
+    def __init__(self):
+        # ETags stay unique across restarts even though versions reset
+        self._instance = uuid.uuid4().hex[:8]
+        self._spaces = {}
+        self._lock = threading.Lock()
+        self._current = self._build(0)
+
+    def _build(self, version):
+        spaces = [self._spaces[space_id] for space_id in sorted(self._spaces)]
+        return OccupancySnapshot(version, spaces, f'{self._instance}-{version}')
+
+    def current(self):
+        return self._current
+
+    def load(self, app):
+        """Seed the store from the ParkingSpace table"""
+        with app.app_context():
+            rows = db.session.query(ParkingSpace.space_id, ParkingSpace.is_occupied,
+                                    ParkingSpace.last_updated).all()
+        return self.apply(rows)
+
+    def apply(self, transitions):
+        """Merge transitions and publish a new snapshot if anything changed"""
+        with self._lock:
+            changed = False
+            for space_id, occupied, timestamp in transitions:
+                status = SpaceStatus(space_id, bool(occupied), timestamp)
+                previous = self._spaces.get(space_id)
+                if previous is None or previous.is_occupied != status.is_occupied:
+                    self._spaces[space_id] = status
+                    changed = True
+            if changed:
+                self._current = self._build(self._current.version + 1)
+            return self._current
@@ -0,0 +1,117 @@
+import time
+import threading
+from datetime import datetime
+import numpy as np
+from sqlalchemy import case
+from models import ParkingSpace, ParkingHistory, db
+from metrics import registry
+
+
+class OccupancyWriter:
+    """In-memory occupancy state with batched, change-only database writes
+
+    ``submit`` diffs each detection result against the current state vector
+    and records only the transitions. ``flush`` writes them in one
+    transaction: a single UPDATE of the changed ParkingSpace rows and one
+    bulk INSERT into ParkingHistory. Flushes happen from ``submit`` at most
+    every ``flush_interval`` seconds.
+    """
+
+    def __init__(self, app, space_ids, flush_interval=1.0):
+        self.app = app
+        self.space_ids = list(space_ids)
+        self.flush_interval = flush_interval
+        self.state = np.zeros(len(self.space_ids), dtype=bool)
+
+        # Latest pending value per space index, and every transition
+        self._pending = {}
+        self._history = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.load()
+
+    def load(self):
+        """Initialise the state vector from the database"""
+        with self.app.app_context():
+            rows = {space_id: (bool(occupied), timestamp) for space_id, occupied, timestamp in
+                    db.session.query(ParkingSpace.space_id, ParkingSpace.is_occupied, ParkingSpace.last_updated)
+                    .filter(ParkingSpace.space_id.in_(self.space_ids)).all()}
+            missing = [space_id for space_id in self.space_ids if space_id not in rows]
+            if missing:
+                now = datetime.utcnow()
+                db.session.execute(ParkingSpace.__table__.insert(), [
+                    {'space_id': space_id, 'is_occupied': False, 'last_updated': now}
+                    for space_id in missing
+                ])
+                db.session.commit()
+                rows.update({space_id: (False, now) for space_id in missing})
+        self.state[:] = [rows[space_id][0] for space_id in self.space_ids]
+        self._notify([(space_id, occupied, timestamp) for space_id, (occupied, timestamp) in rows.items()])
+
+    def _notify(self, transitions):
+        for listener in self.app.extensions.get('occupancy_listeners', ()):
+            try:
+                listener(transitions)
+            except Exception as e:
+                print(f"Error in occupancy listener: {e}")
+
+    def submit(self, results, now=None):
+        """Record transitions in results; returns [(space_id, occupied, time)]"""
+        results = np.asarray(results, dtype=bool)
+        changed = np.flatnonzero(results != self.state)
+
+        transitions = []
+        if len(changed):
+            timestamp = datetime.utcnow()
+            with self._lock:
+                for index in changed:
+                    occupied = bool(results[index])
+                    space_id = self.space_ids[index]
+                    self._pending[space_id] = (occupied, timestamp)
+                    self._history.append({'space_id': space_id, 'occupied': occupied, 'timestamp': timestamp})
+                    transitions.append((space_id, occupied, timestamp))
+                self.state[changed] = results[changed]
+            self._notify(transitions)
+
+        now = time.monotonic() if now is None else now
+        if now - self._last_flush >= self.flush_interval:
+            self.flush(now)
+        return transitions
+
+    def flush(self, now=None):
+        """Write pending transitions in a single transaction"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            history, self._history = self._history, []
+            self._last_flush = time.monotonic() if now is None else now
+        if not pending:
+            return 0
+
+        table = ParkingSpace.__table__
+        with self.app.app_context():
+            try:
+                with registry.timer('stage', stage='db_flush'):
+                    self._write(table, pending, history)
+            except Exception:
+                db.session.rollback()
+                # Keep the transitions for the next flush
+                with self._lock:
+                    for space_id, value in pending.items():
+                        self._pending.setdefault(space_id, value)
+                    self._history[:0] = history
+                raise
+        return len(pending)
+
+    def _write(self, table, pending, history):
+        db.session.execute(
+            table.update()
+            .where(table.c.space_id.in_(list(pending)))
+            .values(
+                is_occupied=case({space_id: occupied for space_id, (occupied, _) in pending.items()},
+                                 value=table.c.space_id),
+                last_updated=case({space_id: ts for space_id, (_, ts) in pending.items()},
+                                  value=table.c.space_id),
+            )
+        )
+        db.session.execute(ParkingHistory.__table__.insert(), history)
+        db.session.commit()
@@ -1,11 +1,21 @@
 import cv2
-import json
 import numpy as np
 from models import ParkingSpace, ParkingHistory, db
-from datetime import datetime
 from flask import current_app
+from parking_layout import load_layout
+from frame_features import FeatureExtractor
+from occupancy_engine import VectorizedScorer
+from motion_gate import MotionGate
+from occupancy_writer import OccupancyWriter
+from occupancy_filter import OccupancyFilter
+from annotation_renderer import AnnotationRenderer
+from background_model import BackgroundModel, median_background
+from metrics import registry
 
 class ParkingDetector:
+    # Frame features read by score_features
+    required_features = ('thresh', 'edges', 'hsv')
+    
     def __init__(self, video_path, json_path, app=None):
         self.video_path = video_path
         self.json_path = json_path
@@ -20,9 +30,23 @@ class ParkingDetector:
         self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         self.fps = self.cap.get(cv2.CAP_PROP_FPS)
         
-        # Load bounding boxes
-        with open(json_path) as f:
-            self.bounding_boxes = json.load(f)
+        # Per-space ROI index for this frame size, from bounding_boxes.json
+        # or memory-mapped from a compiled layout (see compile_layout.py)
+        self.layout = load_layout(json_path, (self.height, self.width))
+        self.bounding_boxes = self.layout.bounding_boxes
+        self.scorer = VectorizedScorer(self.layout)
+        self.renderer = AnnotationRenderer(self.layout)
+        
+        # Shared per-frame feature stage (grayscale, blur, edges, HSV, ...)
+        self.feature_extractor = FeatureExtractor()
+        self.feature_extractor.register('thresh', self.compute_change_mask)
+        
+        # Optional motion gate, temporal filter, background model and the
+        # last occupancy vector
+        self.motion_gate = None
+        self.occupancy_filter = None
+        self.background_model = None
+        self.last_results = None
         
         # Store reference frame for comparison
         self.reference_frame = None
@@ -30,14 +54,35 @@ class ParkingDetector:
         
         # Initialize parking spaces in database if not exists
         self.init_parking_spaces()
+        
+        # In-memory occupancy state with batched, change-only DB writes
+        self.writer = None
+        if self.app:
+            self.writer = OccupancyWriter(self.app, self.layout.space_ids,
+                                          self.app.config.get('DB_FLUSH_INTERVAL', 1.0))
     
-    def get_reference_frame(self):
-        """Capture a reference frame (empty parking lot)"""
-        ret, frame = self.cap.read()
-        if ret:
-            self.reference_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            # Reset video to beginning
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    def get_reference_frame(self, samples=1):
+        """Capture a reference frame (empty parking lot)
+        
+        With samples > 1 the reference is the per-pixel median of frames
+        spread over the video, which drops cars that come and go.
+        """
+        frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = max(frame_count // samples, 1) if samples > 1 and frame_count > 0 else 1
+        
+        frames = []
+        for i in range(samples):
+            if step > 1:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, i * step)
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        
+        if frames:
+            self.reference_frame = frames[0] if len(frames) == 1 else median_background(frames)
+        # Reset video to beginning
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
     
     def init_parking_spaces(self):
         # Use application context if available
@@ -53,17 +98,24 @@ class ParkingDetector:
             # Fallback: just print a message
             print("No app context available for database initialization")
     
-    def process_frame(self):
+    def read_frame(self):
+        """Read the next frame, looping back to the start of the video"""
         ret, frame = self.cap.read()
         if not ret:
             # Reset video to beginning if we've reached the end
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             ret, frame = self.cap.read()
             if not ret:
-                return None, None
+                return None
+        return frame
+    
+    def process_frame(self):
+        frame = self.read_frame()
+        if frame is None:
+            return None, None
         
         # Run parking detection
-        results = self.detect_occupancy(frame)
+        results = self.detect_occupancy_gated(frame)
         
         # Draw bounding boxes on frame
         annotated_frame = self.draw_bounding_boxes(frame.copy(), results)
@@ -73,17 +125,49 @@ class ParkingDetector:
         
         return annotated_frame, results
     
-    def detect_occupancy(self, frame):
-        # Convert to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Apply Gaussian blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        
+    def configure(self, motion_gate=None, background_model=None, occupancy_filter=None):
+        """Enable optional stages from their keyword arguments (None = off)"""
+        if motion_gate is not None:
+            self.enable_motion_gate(**motion_gate)
+        if background_model is not None:
+            self.enable_background_model(**background_model)
+        if occupancy_filter is not None:
+            self.enable_occupancy_filter(**occupancy_filter)
+    
+    def enable_motion_gate(self, **kwargs):
+        """Skip or narrow detection on frames where nothing moved"""
+        self.motion_gate = MotionGate(self.layout, **kwargs)
+        return self.motion_gate
+    
+    def detect_occupancy_gated(self, frame):
+        """detect_occupancy behind the motion gate, if one is enabled"""
+        if self.motion_gate is None:
+            results = self.detect_occupancy(frame)
+        else:
+            dirty = self.motion_gate.check(frame, pending=self.filter_pending())
+            if dirty is None and self.last_results is not None:
+                return self.last_results
+            results = MotionGate.merge(self.last_results, self.detect_occupancy(frame), dirty)
+        self.last_results = results
+        return results
+    
+    def extract_features(self, frame):
+        """Start the shared per-frame feature stage for a frame"""
+        return self.feature_extractor.extract(frame)
+    
+    def compute_features(self, frame):
+        """Extract features and eagerly compute everything the scorer reads"""
+        features = self.extract_features(frame)
+        for name in self.required_features:
+            features[name]
+        return features
+    
+    def compute_change_mask(self, features):
+        """Binary mask of pixels that differ from the reference frame"""
         # If we have a reference frame, use frame difference
         if self.reference_frame is not None:
             # Calculate absolute difference between current frame and reference
-            frame_diff = cv2.absdiff(self.reference_frame, blurred)
+            frame_diff = cv2.absdiff(self.reference_frame, features.blurred)
             
             # Apply threshold to highlight changes
             _, thresh = cv2.threshold(frame_diff, 25, 255, cv2.THRESH_BINARY)
@@ -94,32 +178,82 @@ class ParkingDetector:
             thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
         else:
             # Fallback: use edge detection
-            edges = cv2.Canny(blurred, 50, 150)
-            thresh = edges
+            thresh = cv2.Canny(features.blurred, 50, 150)
         
+        return thresh
+    
+    def detect_occupancy(self, frame):
+        return self.score_features(self.extract_features(frame))
+    
+    def score_features(self, features):
+        # Score all spaces at once; two of the three methods must agree
+        votes = self.scorer.score(features)
+        occupied = self.apply_occupancy_filter(votes >= 2, votes / 3.0)
+        self.update_background(features, occupied)
+        return occupied.tolist()
+    
+    def enable_background_model(self, bootstrap_frames=1, **kwargs):
+        """Keep the reference frame up to date (see BackgroundModel)"""
+        if bootstrap_frames > 1:
+            self.get_reference_frame(bootstrap_frames)
+        if self.reference_frame is None:
+            print("No reference frame available for the background model")
+            return None
+        self.background_model = BackgroundModel(self.layout, self.reference_frame, **kwargs)
+        return self.background_model
+    
+    def update_background(self, features, occupied):
+        """Fold free parts of the frame into the background model, if enabled"""
+        if self.background_model is None:
+            return
+        background = self.background_model.update(features.gray, occupied)
+        if background is not None:
+            # Swapped, not written in place, for the feature stage's sake
+            self.reference_frame = background
+    
+    def enable_occupancy_filter(self, **kwargs):
+        """Debounce per-space decisions over time (see OccupancyFilter)"""
+        self.occupancy_filter = OccupancyFilter(len(self.layout), **kwargs)
+        if self.writer is not None:
+            self.occupancy_filter.reset(self.writer.state)
+        return self.occupancy_filter
+    
+    def apply_occupancy_filter(self, occupied, scores=None):
+        """Pass raw decisions through the temporal filter, if enabled"""
+        if self.occupancy_filter is None:
+            return np.asarray(occupied, dtype=bool)
+        return self.occupancy_filter.update(occupied, scores).copy()
+    
+    def filter_pending(self):
+        """Spaces the temporal filter is still confirming, or None"""
+        if self.occupancy_filter is None:
+            return None
+        return self.occupancy_filter.pending()
+    
+    def score_features_batch(self, features_list):
+        return [self.score_features(features) for features in features_list]
+    
+    def score_features_per_space(self, features):
+        """Reference per-space implementation of score_features"""
         # Check each parking space for occupancy using multiple methods
         space_status = []
-        for box in self.bounding_boxes:
-            space_id = box['id']
-            points = box['points']
+        for roi in self.layout:
+            if roi.w == 0 or roi.h == 0:
+                # Space lies entirely outside the frame
+                space_status.append(False)
+                continue
             
-            # Convert points to polygon and create mask
-            polygon = np.array(points, np.int32)
-            mask = np.zeros_like(thresh)
-            cv2.fillPoly(mask, [polygon], 255)
-            
-            # Method 1: Count non-zero pixels in the masked area
-            masked = cv2.bitwise_and(thresh, thresh, mask=mask)
-            non_zero = cv2.countNonZero(masked)
+            # Method 1: Count changed pixels in the masked crop
+            non_zero = self.count_changed_pixels(features, roi)
             
             # Method 2: Analyze color features in the region
-            color_analysis = self.analyze_color_features(frame, polygon)
+            color_analysis = self.analyze_color_features(features, roi)
             
             # Method 3: Check for edges (indicating vehicle presence)
-            edge_density = self.calculate_edge_density(gray, polygon)
+            edge_density = self.calculate_edge_density(features, roi)
             
             # Combine multiple detection methods
-            area = cv2.contourArea(polygon)
+            area = roi.area
             
             # Adjust these thresholds based on your video
             threshold_1 = non_zero > area * 0.15  # 15% of area has changes
@@ -133,20 +267,19 @@ class ParkingDetector:
         
         return space_status
     
-    def analyze_color_features(self, frame, polygon):
+    def count_changed_pixels(self, features, roi):
+        """Count pixels in the parking space that differ from the reference"""
+        thresh = roi.crop(features.thresh)
+        masked = cv2.bitwise_and(thresh, thresh, mask=roi.mask)
+        return cv2.countNonZero(masked)
+    
+    def analyze_color_features(self, features, roi):
         """Analyze color features to detect vehicles"""
-        # Create mask for the parking space
-        mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-        cv2.fillPoly(mask, [polygon], 255)
-        
-        # Extract the region of interest
-        masked_frame = cv2.bitwise_and(frame, frame, mask=mask)
-        
-        # Convert to HSV color space for better color analysis
-        hsv = cv2.cvtColor(masked_frame, cv2.COLOR_BGR2HSV)
+        # HSV is computed once per frame; only the space's crop is read
+        hsv = roi.crop(features.hsv)
         
         # Calculate color variance - vehicles typically have more color variation
-        mean, std_dev = cv2.meanStdDev(hsv, mask=mask)
+        mean, std_dev = cv2.meanStdDev(hsv, mask=roi.mask)
         color_variance = np.mean(std_dev)
         
         # Normalize the variance value
@@ -154,86 +287,33 @@ class ParkingDetector:
         
         return normalized_variance
     
-    def calculate_edge_density(self, gray_frame, polygon):
+    def calculate_edge_density(self, features, roi):
         """Calculate edge density in the parking space"""
-        # Create mask for the parking space
-        mask = np.zeros(gray_frame.shape, dtype=np.uint8)
-        cv2.fillPoly(mask, [polygon], 255)
-        
-        # Detect edges in the frame
-        edges = cv2.Canny(gray_frame, 50, 150)
+        # The edge map is computed once per frame; only the crop is read
+        edges = roi.crop(features.edges)
         
         # Count edges in the masked area
-        masked_edges = cv2.bitwise_and(edges, edges, mask=mask)
+        masked_edges = cv2.bitwise_and(edges, edges, mask=roi.mask)
         edge_count = cv2.countNonZero(masked_edges)
         
         # Calculate edge density
-        area = cv2.contourArea(polygon)
+        area = roi.area
         edge_density = edge_count / area if area > 0 else 0
         
         return edge_density
     
     def draw_bounding_boxes(self, frame, results):
-        # Draw each parking space with color based on occupancy
-        for i, box in enumerate(self.bounding_boxes):
-            space_id = box['id']
-            points = box['points']
-            
-            # Convert points to polygon
-            polygon = np.array(points, np.int32)
-            
-            # Choose color based on occupancy (red for occupied, green for available)
-            color = (0, 0, 255) if results[i] else (0, 255, 0)
-            
-            # Draw the polygon
-            cv2.polylines(frame, [polygon], True, color, 2)
-            
-            # Fill the polygon with semi-transparent color
-            overlay = frame.copy()
-            cv2.fillPoly(overlay, [polygon], color)
-            cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
-            
-            # Add space ID text
-            center_x = int(sum([p[0] for p in points]) / len(points))
-            center_y = int(sum([p[1] for p in points]) / len(points))
-            cv2.putText(frame, str(space_id), (int(center_x) - 10, int(center_y)), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            # Add occupancy status text
-            status = "Occupied" if results[i] else "Available"
-            text_color = (0, 0, 255) if results[i] else (0, 255, 0)
-            cv2.putText(frame, status, (int(center_x) - 30, int(center_y) + 25), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, text_color, 2)
-        
-        # Add timestamp and statistics
-        occupied_count = sum(results)
-        total_count = len(results)
-        utilization = (occupied_count / total_count * 100) if total_count > 0 else 0
-        
-        cv2.putText(frame, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 
-                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.putText(frame, f"Occupied: {occupied_count}/{total_count} ({utilization:.1f}%)", 
-                   (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        return frame
+        # Tint, outline and label each space (red occupied, green available)
+        with registry.timer('stage', stage='annotate'):
+            return self.renderer.render(frame, results)
     
     def update_parking_status(self, results):
-        # Update database with detection results
-        if self.app:
-            with self.app.app_context():
-                for i, status in enumerate(results):
-                    space = ParkingSpace.query.filter_by(space_id=i).first()
-                    if space and space.is_occupied != status:
-                        space.is_occupied = status
-                        space.last_updated = datetime.utcnow()
-                        
-                        # Add to history
-                        history = ParkingHistory(space_id=i, occupied=status)
-                        db.session.add(history)
-                
-                db.session.commit()
+        # Record transitions; the writer flushes them to the database in batches
+        if self.writer:
+            return self.writer.submit(results)
         else:
             print("No app context available for database update")
+            return []
     
     def get_parking_status(self):
         if self.app:
@@ -250,4 +330,6 @@ class ParkingDetector:
         return []
     
     def release(self):
+        if self.writer:
+            self.writer.flush()
         self.cap.release()
\ No newline at end of file
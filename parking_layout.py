@@ -0,0 +1,276 @@
+import json
+import cv2
+import numpy as np
+
+# Compiled layout files: magic, format version, then a JSON header
+# describing each array and the raw arrays themselves, 64-byte aligned
+LAYOUT_MAGIC = b'PKLAYOUT'
+LAYOUT_VERSION = 1
+_ALIGNMENT = 64
+
+
+class SpaceROI:
+    """Precomputed geometry for a single parking space"""
+
+    def __init__(self, space_id, points, frame_shape):
+        self.space_id = space_id
+        self.points = points
+        self.polygon = np.array(points, np.int32)
+        self.area = cv2.contourArea(self.polygon)
+
+        # Centre used for drawing labels
+        self.center = (int(sum([p[0] for p in points]) / len(points)),
+                       int(sum([p[1] for p in points]) / len(points)))
+
+        # Bounding rect clipped to the frame
+        frame_h, frame_w = frame_shape[:2]
+        x, y, w, h = cv2.boundingRect(self.polygon)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame_w), min(y + h, frame_h)
+        self.x, self.y = x0, y0
+        self.w, self.h = max(x1 - x0, 0), max(y1 - y0, 0)
+
+        # Polygon mask in crop coordinates
+        self.mask = np.zeros((self.h, self.w), dtype=np.uint8)
+        if self.w > 0 and self.h > 0:
+            cv2.fillPoly(self.mask, [self.polygon - np.array([x0, y0], np.int32)], 255)
+
+    @classmethod
+    def from_compiled(cls, space_id, polygon, area, center, rect, mask):
+        """Rebuild an ROI from precomputed geometry without rasterizing"""
+        roi = cls.__new__(cls)
+        roi.space_id = space_id
+        roi.polygon = polygon
+        roi.points = polygon.tolist()
+        roi.area = area
+        roi.center = center
+        roi.x, roi.y, roi.w, roi.h = rect
+        roi.mask = mask
+        return roi
+
+    @property
+    def slices(self):
+        """Row/column slices of the crop in frame coordinates"""
+        return slice(self.y, self.y + self.h), slice(self.x, self.x + self.w)
+
+    def crop(self, image):
+        """Return the view of image covered by this space's bounding rect"""
+        rows, cols = self.slices
+        return image[rows, cols]
+
+
+class ParkingLayout:
+    """Spatial index of all parking spaces, built once per frame size"""
+
+    def __init__(self, bounding_boxes, frame_shape):
+        self.bounding_boxes = bounding_boxes
+        self.frame_shape = tuple(frame_shape[:2])
+        self.spaces = [SpaceROI(box['id'], box['points'], self.frame_shape)
+                       for box in bounding_boxes]
+        self._build_label_index()
+
+    def _build_label_index(self):
+        """Rasterize every space into one label image plus a gather table
+
+        ``labels`` maps each pixel to ``index + 1`` of the space covering it
+        (0 for background); where polygons overlap the first space wins.
+        ``pixel_index``/``pixel_labels`` list every (flat pixel, label) pair
+        including overlapping pixels, so per-space reductions over them
+        match the individual polygon masks exactly.
+        """
+        frame_h, frame_w = self.frame_shape
+        self.labels = np.zeros((frame_h, frame_w), dtype=np.int32)
+
+        flat_index = []
+        flat_labels = []
+        for i, roi in enumerate(self.spaces):
+            if roi.w == 0 or roi.h == 0:
+                continue
+            inside = roi.mask > 0
+            ys, xs = np.nonzero(inside)
+            flat_index.append((ys + roi.y) * frame_w + (xs + roi.x))
+            flat_labels.append(np.full(len(ys), i + 1, dtype=np.int32))
+
+            region = roi.crop(self.labels)
+            region[inside & (region == 0)] = i + 1
+
+        if flat_index:
+            pixel_index = np.concatenate(flat_index).astype(np.intp)
+            pixel_labels = np.concatenate(flat_labels)
+        else:
+            pixel_index = np.zeros(0, dtype=np.intp)
+            pixel_labels = np.zeros(0, dtype=np.int32)
+
+        # The table is grouped by label (row-major within each space), so
+        # every space is one contiguous segment starting at segment_starts
+        self.pixel_index = pixel_index
+        self.pixel_labels = pixel_labels
+        self.pixel_counts = np.bincount(self.pixel_labels, minlength=len(self.spaces) + 1)
+        self.segment_starts = np.zeros(len(self.spaces), dtype=np.intp)
+        self.segment_starts[1:] = np.cumsum(self.pixel_counts[1:])[:-1]
+        self.areas = np.array([roi.area for roi in self.spaces], dtype=np.float64)
+        self.overlap_pixels = len(self.pixel_index) - np.count_nonzero(self.labels)
+
+    def validate(self):
+        """List of problems with the layout at this frame size
+
+        Each entry is a dict with a ``type`` of 'duplicate_id',
+        'degenerate', 'outside_frame', 'partly_outside_frame' or 'overlap'.
+        """
+        frame_h, frame_w = self.frame_shape
+        issues = []
+
+        seen = set()
+        for roi in self.spaces:
+            if roi.space_id in seen:
+                issues.append({'type': 'duplicate_id', 'space_id': roi.space_id})
+            seen.add(roi.space_id)
+
+            if len(roi.polygon) < 3 or roi.area <= 0:
+                issues.append({'type': 'degenerate', 'space_id': roi.space_id})
+            if roi.w == 0 or roi.h == 0:
+                issues.append({'type': 'outside_frame', 'space_id': roi.space_id})
+            elif (roi.polygon[:, 0].min() < 0 or roi.polygon[:, 1].min() < 0 or
+                  roi.polygon[:, 0].max() >= frame_w or roi.polygon[:, 1].max() >= frame_h):
+                issues.append({'type': 'partly_outside_frame', 'space_id': roi.space_id})
+
+        # Pixels of a later space that the label image gave to an earlier one
+        owners = np.take(self.labels.ravel(), self.pixel_index)
+        shared = owners != self.pixel_labels
+        if shared.any():
+            pairs, counts = np.unique(np.stack([owners[shared], self.pixel_labels[shared]], axis=1),
+                                      axis=0, return_counts=True)
+            for (first, second), count in zip(pairs, counts):
+                issues.append({
+                    'type': 'overlap',
+                    'space_ids': [self.spaces[first - 1].space_id, self.spaces[second - 1].space_id],
+                    'pixels': int(count),
+                    'ratio': float(count / max(min(self.pixel_counts[first], self.pixel_counts[second]), 1)),
+                })
+        return issues
+
+    def save(self, path):
+        """Write the compiled layout (see ParkingLayout.load)"""
+        polygons = [roi.polygon.reshape(-1, 2) for roi in self.spaces]
+        masks = [roi.mask.ravel() for roi in self.spaces]
+        arrays = {
+            'space_ids': np.array(self.space_ids, dtype=np.int64),
+            'vertex_offsets': np.cumsum([0] + [len(p) for p in polygons]).astype(np.int64),
+            'vertices': (np.concatenate(polygons) if polygons else np.zeros((0, 2))).astype(np.int32),
+            'areas': self.areas.astype(np.float64),
+            'centers': np.array([roi.center for roi in self.spaces], dtype=np.int32).reshape(-1, 2),
+            'rects': np.array([(roi.x, roi.y, roi.w, roi.h) for roi in self.spaces],
+                              dtype=np.int32).reshape(-1, 4),
+            'mask_offsets': np.cumsum([0] + [len(m) for m in masks]).astype(np.int64),
+            'masks': (np.concatenate(masks) if masks else np.zeros(0)).astype(np.uint8),
+            'labels': self.labels.astype(np.int32),
+            'pixel_index': self.pixel_index.astype(np.int64),
+            'pixel_labels': self.pixel_labels.astype(np.int32),
+            'pixel_counts': self.pixel_counts.astype(np.int64),
+            'segment_starts': self.segment_starts.astype(np.int64),
+        }
+
+        header = {'frame_shape': list(self.frame_shape), 'overlap_pixels': int(self.overlap_pixels),
+                  'arrays': {}}
+        # Offsets depend on the header length, so lay out against a padded header
+        header_size = 4096 + 128 * len(arrays)
+        offset = len(LAYOUT_MAGIC) + 8 + header_size
+        for name, array in arrays.items():
+            offset = -(-offset // _ALIGNMENT) * _ALIGNMENT
+            header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += array.nbytes
+        encoded = json.dumps(header).encode('utf-8')
+        assert len(encoded) <= header_size
+
+        with open(path, 'wb') as f:
+            f.write(LAYOUT_MAGIC)
+            f.write(np.array([LAYOUT_VERSION, header_size], dtype='<u4').tobytes())
+            f.write(encoded.ljust(header_size, b' '))
+            for name, array in arrays.items():
+                f.seek(header['arrays'][name]['offset'])
+                f.write(np.ascontiguousarray(array).tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a layout written by ``save``; nothing is recomputed"""
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(data[:len(LAYOUT_MAGIC)]) != LAYOUT_MAGIC:
+            raise ValueError(f"Not a compiled parking layout: {path}")
+        version, header_size = np.frombuffer(data[len(LAYOUT_MAGIC):len(LAYOUT_MAGIC) + 8], dtype='<u4')
+        if version != LAYOUT_VERSION:
+            raise ValueError(f"Unsupported layout version {version} in {path}")
+        start = len(LAYOUT_MAGIC) + 8
+        header = json.loads(bytes(data[start:start + header_size]))
+
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'])) if spec['shape'] else 1
+            if count == 0:
+                # Empty arrays may be laid out past the end of the file
+                arrays[name] = np.empty(spec['shape'], dtype=dtype)
+                continue
+            arrays[name] = np.frombuffer(data, dtype=dtype, count=count,
+                                         offset=spec['offset']).reshape(spec['shape'])
+
+        layout = cls.__new__(cls)
+        layout.frame_shape = tuple(header['frame_shape'])
+        vertex_offsets, mask_offsets = arrays['vertex_offsets'], arrays['mask_offsets']
+        layout.spaces = []
+        for i, space_id in enumerate(arrays['space_ids'].tolist()):
+            x, y, w, h = arrays['rects'][i].tolist()
+            layout.spaces.append(SpaceROI.from_compiled(
+                space_id,
+                arrays['vertices'][vertex_offsets[i]:vertex_offsets[i + 1]],
+                float(arrays['areas'][i]),
+                tuple(arrays['centers'][i].tolist()),
+                (x, y, w, h),
+                arrays['masks'][mask_offsets[i]:mask_offsets[i + 1]].reshape(h, w),
+            ))
+        layout.bounding_boxes = [{'id': roi.space_id, 'points': roi.points} for roi in layout.spaces]
+        layout.labels = arrays['labels']
+        layout.pixel_index = arrays['pixel_index'].astype(np.intp, copy=False)
+        layout.pixel_labels = arrays['pixel_labels']
+        layout.pixel_counts = arrays['pixel_counts']
+        layout.segment_starts = arrays['segment_starts'].astype(np.intp, copy=False)
+        layout.areas = arrays['areas']
+        layout.overlap_pixels = header['overlap_pixels']
+        return layout
+
+    def __len__(self):
+        return len(self.spaces)
+
+    def __iter__(self):
+        return iter(self.spaces)
+
+    def __getitem__(self, index):
+        return self.spaces[index]
+
+    @property
+    def space_ids(self):
+        return [space.space_id for space in self.spaces]
+
+
+def is_compiled_layout(path):
+    with open(path, 'rb') as f:
+        return f.read(len(LAYOUT_MAGIC)) == LAYOUT_MAGIC
+
+
+def load_bounding_boxes(path):
+    """Space list (``id`` and ``points``) from a JSON or compiled layout file"""
+    if is_compiled_layout(path):
+        return ParkingLayout.load(path).bounding_boxes
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_layout(path, frame_shape):
+    """ParkingLayout for frame_shape, memory-mapped when a compiled file matches"""
+    if is_compiled_layout(path):
+        layout = ParkingLayout.load(path)
+        if layout.frame_shape == tuple(frame_shape[:2]):
+            return layout
+        print(f"Compiled layout {path} is for {layout.frame_shape}, rebuilding for {tuple(frame_shape[:2])}")
+        return ParkingLayout(layout.bounding_boxes, frame_shape)
+    with open(path) as f:
+        return ParkingLayout(json.load(f), frame_shape)
@@ -0,0 +1,114 @@
+import math
+import bisect
+import threading
+import cv2
+import numpy as np
+
+# Recommendations returned when the request does not ask for a count
+DEFAULT_RECOMMENDATIONS = 3
+
+# Used when no entrance is configured: the top-left corner of the frame
+DEFAULT_ENTRANCES = [{'id': 'main', 'point': [0, 0]}]
+
+
+def polygon_centroid(points):
+    """Area centroid of a polygon, or the vertex mean if it is degenerate"""
+    polygon = np.array(points, np.float32)
+    moments = cv2.moments(polygon)
+    if moments['m00']:
+        return moments['m10'] / moments['m00'], moments['m01'] / moments['m00']
+    return float(polygon[:, 0].mean()), float(polygon[:, 1].mean())
+
+
+class RecommendationEngine:
+    """Nearest free spaces per entrance, kept sorted as occupancy changes
+
+    For every entrance, and every (entrance, zone) pair, the free spaces
+    are held in a list sorted by (distance, space_id). Occupancy
+    transitions insert or remove single entries with ``bisect``, so a
+    nearest-k query is a slice of an already sorted list. Zones use the
+    bounding_boxes.json format (``id`` and ``points``); a space belongs to
+    a zone when its centroid lies inside the zone polygon.
+    """
+
+    def __init__(self, bounding_boxes, entrances=None, zones=None):
+        self.entrances = {entrance['id']: tuple(entrance['point'])
+                          for entrance in (entrances or DEFAULT_ENTRANCES)}
+        self.default_entrance = next(iter(self.entrances))
+        self.centroids = {box['id']: polygon_centroid(box['points']) for box in bounding_boxes}
+
+        # Zone membership by centroid
+        self.zones = {}
+        for zone in zones or ():
+            polygon = np.array(zone['points'], np.float32)
+            self.zones[zone['id']] = {
+                space_id for space_id, centroid in self.centroids.items()
+                if cv2.pointPolygonTest(polygon, centroid, False) >= 0
+            }
+
+        # Sort keys and the zones each space is indexed under
+        self.distances = {
+            entrance_id: {space_id: math.dist(point, centroid)
+                          for space_id, centroid in self.centroids.items()}
+            for entrance_id, point in self.entrances.items()
+        }
+        self.space_zones = {space_id: [None] + [zone_id for zone_id, members in self.zones.items()
+                                                if space_id in members]
+                            for space_id in self.centroids}
+
+        self._free = {(entrance_id, zone_id): []
+                      for entrance_id in self.entrances
+                      for zone_id in [None] + list(self.zones)}
+        self._occupied = {}
+        self._lock = threading.Lock()
+
+    def _keys(self, space_id):
+        for entrance_id, distances in self.distances.items():
+            entry = (distances[space_id], space_id)
+            for zone_id in self.space_zones[space_id]:
+                yield self._free[(entrance_id, zone_id)], entry
+
+    def apply(self, transitions):
+        """Occupancy listener: move spaces in or out of the free lists"""
+        with self._lock:
+            for space_id, occupied, _ in transitions:
+                if space_id not in self.centroids:
+                    continue
+                occupied = bool(occupied)
+                if self._occupied.get(space_id) == occupied:
+                    continue
+                was_free = self._occupied.get(space_id) is False
+                self._occupied[space_id] = occupied
+
+                for free, entry in self._keys(space_id):
+                    if occupied and was_free:
+                        del free[bisect.bisect_left(free, entry)]
+                    elif not occupied:
+                        bisect.insort(free, entry)
+
+    def nearest(self, k=DEFAULT_RECOMMENDATIONS, entrance=None, zone=None):
+        """Up to k (space_id, distance) pairs, nearest first"""
+        entrance = entrance or self.default_entrance
+        if entrance not in self.entrances:
+            raise KeyError(f"Unknown entrance: {entrance}")
+        if zone is not None and zone not in self.zones:
+            raise KeyError(f"Unknown zone: {zone}")
+        free = self._free[(entrance, zone)]
+        with self._lock:
+            return [(space_id, distance) for distance, space_id in free[:k]], len(free)
+
+    def recommend(self, k=DEFAULT_RECOMMENDATIONS, entrance=None, zone=None):
+        """Response body for /api/parking_recommendations"""
+        spots, total = self.nearest(k, entrance, zone)
+        if not spots:
+            return {'available': False, 'message': 'No parking spaces available'}
+        best_spots = [space_id for space_id, _ in spots]
+        return {
+            'available': True,
+            'total_available': total,
+            'best_spots': best_spots,
+            'spots': [{'space_id': space_id, 'distance': round(distance, 1)} for space_id, distance in spots],
+            'entrance': entrance or self.default_entrance,
+            'zone': zone,
+            'message': f'Recommended spots: {", ".join(map(str, best_spots))}'
+        }
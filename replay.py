@@ -0,0 +1,80 @@
+"""Replay a recorded video and compare raw vs temporally filtered occupancy
+
+Reports how often slots flip and how many database rows those flips would
+write (one ParkingSpace UPDATE and one ParkingHistory INSERT per flip).
+
+    python replay.py carPark.mp4 --mode nofm --window 5 --required 4
+    python replay.py carPark.mp4 --mode ema --alpha 0.3
+"""
+import argparse
+import json
+import numpy as np
+from parking_detection import ParkingDetector
+from occupancy_filter import OccupancyFilter, count_flips
+
+# Rows written per state flip: the ParkingSpace update and a history row
+ROWS_PER_FLIP = 2
+
+
+def replay_votes(video_path, json_path, max_frames=None):
+    """Run the detector over the video once; returns (frames, spaces) votes"""
+    detector = ParkingDetector(video_path, json_path)
+    votes = []
+    try:
+        while max_frames is None or len(votes) < max_frames:
+            ret, frame = detector.cap.read()
+            if not ret:
+                break
+            votes.append(detector.scorer.score(detector.compute_features(frame)))
+    finally:
+        detector.release()
+    return np.array(votes, dtype=np.uint8).reshape(len(votes), len(detector.layout))
+
+
+def apply_filter(votes, **filter_args):
+    """Filtered state for every frame of a (frames, spaces) vote array"""
+    occupancy_filter = OccupancyFilter(votes.shape[1], **filter_args)
+    return np.array([occupancy_filter.update(frame_votes >= 2, frame_votes / 3.0).copy()
+                     for frame_votes in votes], dtype=bool).reshape(votes.shape)
+
+
+def summarize(states):
+    flips = count_flips(states)
+    per_space = np.count_nonzero(states[1:] != states[:-1], axis=0) if len(states) > 1 else np.zeros(0)
+    return {
+        'flips': flips,
+        'db_rows_written': flips * ROWS_PER_FLIP,
+        'max_flips_per_space': int(per_space.max()) if per_space.size else 0,
+        'occupied_last_frame': int(states[-1].sum()) if len(states) else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('video')
+    parser.add_argument('--boxes', default='bounding_boxes.json')
+    parser.add_argument('--max-frames', type=int)
+    parser.add_argument('--mode', choices=('nofm', 'ema'), default='nofm')
+    parser.add_argument('--window', type=int, default=5)
+    parser.add_argument('--required', type=int, default=4)
+    parser.add_argument('--alpha', type=float, default=0.3)
+    parser.add_argument('--on-threshold', type=float, default=0.6)
+    parser.add_argument('--off-threshold', type=float, default=0.4)
+    args = parser.parse_args()
+
+    votes = replay_votes(args.video, args.boxes, args.max_frames)
+    filtered = apply_filter(votes, mode=args.mode, window=args.window, required=args.required,
+                            alpha=args.alpha, on_threshold=args.on_threshold,
+                            off_threshold=args.off_threshold)
+
+    report = {
+        'frames': len(votes),
+        'spaces': votes.shape[1],
+        'raw': summarize(votes >= 2),
+        'filtered': summarize(filtered),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
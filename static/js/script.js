@@ -10,13 +10,11 @@ document.addEventListener('DOMContentLoaded', function() {
     const processFrameBtn = document.getElementById('processFrameBtn');
     if (processFrameBtn) {
         processFrameBtn.addEventListener('click', function() {
-            fetch('/api/process_frame')
+            fetch('/api/process_frame', { method: 'POST' })
                 .then(response => response.json())
                 .then(data => {
                     if (data.success) {
-                        alert('Frame processed successfully');
-                        fetchAndUpdateStatus();
-                        loadParkingRecommendations();
+                        pollFrameJob(data.status_url);
                     } else {
                         alert('Error processing frame: ' + data.message);
                     }
@@ -28,7 +26,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Load recommendations on page load
     loadParkingRecommendations();
     
-    // Auto-refresh parking status and recommendations every 5 seconds
+    // Keep parking status and recommendations up to date
     const autoRefreshPaths = ['/parking_status', '/dashboard', '/admin'];
     const currentPath = window.location.pathname;
     
@@ -37,11 +35,15 @@ document.addEventListener('DOMContentLoaded', function() {
         fetchAndUpdateStatus();
         loadParkingRecommendations();
         
-        // Set up auto-refresh
-        setInterval(function() {
-            fetchAndUpdateStatus();
-            loadParkingRecommendations();
-        }, 5000);
+        // Live updates over Server-Sent Events, polling as a fallback
+        if (window.EventSource) {
+            subscribeToParkingEvents();
+        } else {
+            setInterval(function() {
+                fetchAndUpdateStatus();
+                loadParkingRecommendations();
+            }, 5000);
+        }
     }
     
     // Event delegation for dynamically added buttons
@@ -68,6 +70,25 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// Poll an on-demand frame job until the pipeline has processed it
+function pollFrameJob(statusUrl, attempts = 50) {
+    fetch(statusUrl)
+        .then(response => response.json())
+        .then(job => {
+            if (job.status === 'done') {
+                alert(`Frame processed successfully: ${job.occupied}/${job.total} spaces occupied`);
+                window.open(job.frame_url, '_blank');
+                fetchAndUpdateStatus();
+                loadParkingRecommendations();
+            } else if (job.status === 'pending' && attempts > 0) {
+                setTimeout(() => pollFrameJob(statusUrl, attempts - 1), 200);
+            } else {
+                alert('Error processing frame: ' + (job.error || 'timed out'));
+            }
+        })
+        .catch(error => console.error('Error fetching frame job:', error));
+}
+
 function loadParkingRecommendations() {
     fetch('/api/parking_recommendations')
         .then(response => response.json())
@@ -138,6 +159,52 @@ function fetchAndUpdateStatus() {
         });
 }
 
+// Latest known state of every space, keyed by id
+const parkingState = new Map();
+
+function subscribeToParkingEvents() {
+    const source = new EventSource('/api/parking_events');
+    
+    // Full state: sent on connect and periodically to resync
+    source.addEventListener('snapshot', function(event) {
+        const data = JSON.parse(event.data);
+        parkingState.clear();
+        data.spaces.forEach(space => parkingState.set(space.id, space));
+        renderParkingState();
+        updateRecommendations(data);
+    });
+    
+    // Only the spaces that changed
+    source.addEventListener('change', function(event) {
+        const data = JSON.parse(event.data);
+        data.spaces.forEach(space => parkingState.set(space.id, space));
+        renderParkingState();
+        updateRecommendations(data);
+    });
+    
+    source.onerror = function() {
+        // EventSource reconnects by itself
+        console.error('Parking event stream interrupted, reconnecting...');
+    };
+}
+
+// Events carry the recommendations; only re-fetch (debounced) if one doesn't
+let recommendationsTimer = null;
+
+function updateRecommendations(data) {
+    if (data.recommendations) {
+        updateParkingGuidanceUI(data.recommendations);
+        return;
+    }
+    clearTimeout(recommendationsTimer);
+    recommendationsTimer = setTimeout(loadParkingRecommendations, 1000);
+}
+
+function renderParkingState() {
+    const spaces = Array.from(parkingState.values()).sort((a, b) => a.id - b.id);
+    updateParkingStatusUI(spaces);
+}
+
 function updateParkingStatusUI(data) {
     console.log('Received data:', data);
     
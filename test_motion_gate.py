@@ -0,0 +1,132 @@
+import cv2
+import numpy as np
+import pytest
+from motion_gate import MotionGate
+from occupancy_filter import OccupancyFilter
+from parking_layout import ParkingLayout
+
+FRAME_W, FRAME_H = 320, 240
+
+BOXES = [
+    {'id': 1, 'points': [[10, 10], [90, 10], [90, 80], [10, 80]]},
+    {'id': 2, 'points': [[120, 10], [200, 10], [200, 80], [120, 80]]},
+    {'id': 3, 'points': [[10, 120], [90, 120], [90, 200], [10, 200]]},
+]
+
+
+def empty_lot():
+    rng = np.random.default_rng(0)
+    frame = np.full((FRAME_H, FRAME_W, 3), 90, np.uint8)
+    return frame + rng.integers(0, 12, frame.shape, dtype=np.uint8)
+
+
+def parked_car():
+    """The empty lot with a striped car parked in space 2"""
+    frame = empty_lot()
+    cv2.rectangle(frame, (125, 15), (195, 75), (200, 120, 20), -1)
+    for x in range(129, 195, 8):
+        cv2.line(frame, (x, 18), (x, 72), (255, 255, 255), 2)
+    return frame
+
+
+@pytest.fixture
+def detector(make_detector):
+    return make_detector([empty_lot()] * 5, BOXES)
+
+
+def test_filter_pending_nofm():
+    occupancy_filter = OccupancyFilter(2, window=5, required=4)
+    occupancy_filter.update([False, False])
+    assert not occupancy_filter.pending().any()
+
+    for _ in range(3):
+        state = occupancy_filter.update([True, False])
+        assert state.tolist() == [False, False]
+        assert occupancy_filter.pending().tolist() == [True, False]
+
+    # The fourth agreeing decision flips the state; the space stays pending
+    # until the earlier free decision leaves the window
+    assert occupancy_filter.update([True, False]).tolist() == [True, False]
+    assert occupancy_filter.pending().tolist() == [True, False]
+    occupancy_filter.update([True, False])
+    assert not occupancy_filter.pending().any()
+
+    # A single flicker is pending only while it is in the window
+    occupancy_filter.update([True, True])
+    assert occupancy_filter.pending().tolist() == [False, True]
+    for _ in range(4):
+        occupancy_filter.update([True, False])
+        assert occupancy_filter.pending().tolist() == [False, True]
+    occupancy_filter.update([True, False])
+    assert not occupancy_filter.pending().any()
+
+
+@pytest.mark.parametrize('required', [0, 1, 2, 6])
+def test_filter_rejects_ambiguous_required(required):
+    with pytest.raises(ValueError):
+        OccupancyFilter(1, window=5, required=required)
+
+
+def test_filter_pending_ema():
+    occupancy_filter = OccupancyFilter(1, mode='ema', alpha=0.3)
+    occupancy_filter.update([False], [0.0])
+    occupancy_filter.update([True], [1.0])
+    assert occupancy_filter.pending().tolist() == [True]
+    while not occupancy_filter.update([True], [1.0])[0]:
+        pass
+    assert not occupancy_filter.pending().any()
+
+
+def test_gate_rescores_pending_spaces_on_still_frames():
+    gate = MotionGate(ParkingLayout(BOXES, (FRAME_H, FRAME_W)), min_fps=0, max_fps=15)
+    frame = empty_lot()
+    pending = np.array([False, True, False])
+    assert gate.check(frame, now=0.0).all()
+
+    # Pending spaces are re-scored on still frames, but within max_fps
+    assert gate.check(frame, now=0.01, pending=pending) is None
+    assert gate.check(frame, now=0.1, pending=pending).tolist() == [False, True, False]
+    assert gate.check(frame, now=0.11, pending=pending) is None
+    assert gate.check(frame, now=1.0, pending=np.zeros(3, bool)) is None
+
+
+def test_flickering_space_on_still_frames_is_not_forced_forever():
+    layout = ParkingLayout(BOXES, (FRAME_H, FRAME_W))
+    gate = MotionGate(layout, min_fps=0, max_fps=15)
+    occupancy_filter = OccupancyFilter(len(layout), window=5, required=4)
+    frame = empty_lot()
+
+    # 300 identical frames at 30 fps; space 2's raw vote flips on every
+    # detection, so the filter never confirms it either way
+    detections = 0
+    for index in range(300):
+        dirty = gate.check(frame, now=index / 30.0, pending=occupancy_filter.pending())
+        if dirty is None:
+            continue
+        detections += 1
+        occupancy_filter.update([False, detections % 2 == 0, False])
+
+    assert occupancy_filter.state.tolist() == [False, False, False]
+    # The first detection plus at most `window` forced re-scores
+    assert detections <= 1 + occupancy_filter.window
+    assert gate.skipped >= 300 - 1 - occupancy_filter.window
+
+
+def test_gated_filter_confirms_a_car_that_stops(detector):
+    # No periodic refresh, so only motion or the filter can trigger detection
+    detector.enable_motion_gate(min_fps=0, max_fps=0)
+    detector.enable_occupancy_filter(mode='nofm', window=5, required=4)
+
+    empty, parked = empty_lot(), parked_car()
+    for _ in range(3):
+        assert detector.detect_occupancy_gated(empty) == [False, False, False]
+
+    # The car arrives and then stays perfectly still
+    published = [detector.detect_occupancy_gated(parked)[1] for _ in range(6)]
+    assert published.index(True) == 3
+
+    # Once the decision is confirmed the gate goes back to skipping
+    skipped = detector.motion_gate.skipped
+    for _ in range(10):
+        assert detector.detect_occupancy_gated(parked) == [False, True, False]
+    assert detector.motion_gate.skipped - skipped >= 9
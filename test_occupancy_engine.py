@@ -0,0 +1,82 @@
+import cv2
+import numpy as np
+import pytest
+
+FRAME_W, FRAME_H = 320, 240
+FRAMES = 20
+
+BOXES = [
+    {'id': 1, 'points': [[10, 10], [70, 10], [70, 60], [10, 60]]},
+    {'id': 2, 'points': [[80, 10], [140, 10], [140, 60], [80, 60]]},
+    # Overlaps space 2
+    {'id': 3, 'points': [[120, 20], [180, 20], [180, 70], [120, 70]]},
+    # Slanted, and overlapping space 1
+    {'id': 4, 'points': [[40, 50], [100, 70], [90, 120], [30, 100]]},
+    {'id': 5, 'points': [[200, 150], [300, 150], [300, 230], [200, 230]]},
+    # Partly outside the frame
+    {'id': 6, 'points': [[280, 80], [360, 80], [360, 130], [280, 130]]},
+    # Entirely outside the frame
+    {'id': 7, 'points': [[400, 300], [460, 300], [460, 350], [400, 350]]},
+]
+
+
+def draw_car(frame, x0, y0, x1, y1, color):
+    """Filled body with bright stripes, for colour variance and edges"""
+    cv2.rectangle(frame, (x0, y0), (x1, y1), color, -1)
+    for x in range(x0 + 4, x1, 8):
+        cv2.line(frame, (x, y0 + 3), (x, y1 - 3), (255, 255, 255), 2)
+    cv2.rectangle(frame, (x0, y0), (x1, y1), (0, 0, 0), 2)
+
+
+def make_frame(index, rng):
+    """Textured empty lot with 'cars' coming and going over the clip"""
+    frame = np.full((FRAME_H, FRAME_W, 3), 90, np.uint8)
+    frame += rng.integers(0, 12, frame.shape, dtype=np.uint8)
+    if index >= 3:
+        draw_car(frame, 15, 15, 65, 55, (30, 40, 200))
+    if index >= 8:
+        # Across the overlap of spaces 2 and 3
+        draw_car(frame, 100, 15, 170, 65, (200, 120, 20))
+    if 5 <= index < 15:
+        draw_car(frame, 210, 160, 290, 220, (20, 200, 60))
+    if index >= 12:
+        draw_car(frame, 285, 85, 319, 125, (0, 0, 255))
+    return frame
+
+
+@pytest.fixture
+def detector(make_detector):
+    rng = np.random.default_rng(0)
+    return make_detector([make_frame(index, rng) for index in range(FRAMES)], BOXES)
+
+
+def test_vectorized_scoring_matches_per_space(detector):
+    assert detector.layout.overlap_pixels > 0
+
+    seen = []
+    for _ in range(FRAMES):
+        frame = detector.read_frame()
+        features = detector.compute_features(frame)
+        expected = [bool(occupied) for occupied in detector.score_features_per_space(features)]
+        assert [bool(occupied) for occupied in detector.score_features(features)] == expected
+        seen.append(expected)
+
+    seen = np.array(seen)
+    # The clip exercises both states, and the off-frame space is never occupied
+    assert seen.any() and not seen.all()
+    assert not seen[:, -1].any()
+
+
+def test_raw_scores_match_per_space(detector):
+    scorer = detector.scorer
+    for _ in range(FRAMES):
+        features = detector.compute_features(detector.read_frame())
+        changed = scorer.changed_pixels(features)
+        colors = scorer.color_scores(features)
+        edges = scorer.edge_densities(features)
+        for i, roi in enumerate(detector.layout):
+            if roi.w == 0 or roi.h == 0:
+                continue
+            assert changed[i] == detector.count_changed_pixels(features, roi)
+            assert colors[i] == pytest.approx(detector.analyze_color_features(features, roi), abs=1e-9)
+            assert edges[i] == pytest.approx(detector.calculate_edge_density(features, roi), abs=1e-12)
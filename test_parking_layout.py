@@ -0,0 +1,47 @@
+import numpy as np
+from parking_layout import ParkingLayout, load_layout
+
+FRAME_SHAPE = (240, 320)
+
+BOXES = [
+    {'id': 1, 'points': [[10, 10], [70, 10], [70, 60], [10, 60]]},
+    {'id': 2, 'points': [[60, 20], [120, 20], [110, 90], [50, 80]]},
+    {'id': 3, 'points': [[400, 300], [460, 300], [460, 350], [400, 350]]},
+]
+
+
+def test_compiled_layout_round_trip(tmp_path):
+    path = str(tmp_path / 'lot.layout')
+    layout = ParkingLayout(BOXES, FRAME_SHAPE)
+    layout.save(path)
+
+    loaded = load_layout(path, FRAME_SHAPE)
+    assert loaded.frame_shape == FRAME_SHAPE
+    assert loaded.space_ids == layout.space_ids
+    assert loaded.overlap_pixels == layout.overlap_pixels > 0
+    for name in ('labels', 'pixel_index', 'pixel_labels', 'pixel_counts', 'segment_starts', 'areas'):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(layout, name))
+    for original, compiled in zip(layout, loaded):
+        assert (compiled.x, compiled.y, compiled.w, compiled.h) == (original.x, original.y, original.w, original.h)
+        np.testing.assert_array_equal(compiled.mask, original.mask)
+
+
+def test_empty_layout_round_trip(tmp_path):
+    path = str(tmp_path / 'empty.layout')
+    ParkingLayout([], FRAME_SHAPE).save(path)
+
+    loaded = ParkingLayout.load(path)
+    assert len(loaded) == 0
+    assert loaded.frame_shape == FRAME_SHAPE
+    assert len(loaded.pixel_index) == 0
+    assert not loaded.labels.any()
+
+
+def test_layout_outside_frame_only(tmp_path):
+    path = str(tmp_path / 'outside.layout')
+    ParkingLayout(BOXES[2:], FRAME_SHAPE).save(path)
+
+    loaded = ParkingLayout.load(path)
+    assert loaded.space_ids == [3]
+    assert loaded[0].mask.shape == (0, 0)
+    assert len(loaded.pixel_index) == 0